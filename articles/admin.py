@@ -1,6 +1,11 @@
 from django.contrib import admin, messages
 from django.contrib.auth.models import Group
-from .models import Category, Article
+from django.db.models import F
+from django.utils import timezone
+from . import jobs, moderation, search
+from .cache import enqueue_warm, invalidate_articles
+from .models import Category, Article, Job
+from .services import refresh_author_stats
 
 admin.site.unregister(Group)
 
@@ -14,28 +19,63 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'category', 'is_published', 'rating_percent_display', 'created_at')
-    list_filter = ('category', 'is_published', 'created_at')
+    list_filter = ('category', 'is_published', 'is_rejected', 'created_at')
     search_fields = ('title', 'content')
     ordering = ('-created_at',)
+    list_select_related = ('author', 'category')
 
-    actions = ['approve_articles', 'unpublish_articles']
+    actions = ['approve_articles', 'unpublish_articles', 'recount_articles']
 
+    def get_search_results(self, request, queryset, search_term):
+        # поиск через FTS5-индекс вместо LIKE '%q%' по content
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
 
     @admin.display(description="Like Rating %")
     def rating_percent_display(self, obj):
-        likes = obj.votes.filter(value=1).count()
-        dislikes = obj.votes.filter(value=-1).count()
-        total = likes + dislikes
-        if total == 0:
-            return "0%"
-        return f"{round((likes / total) * 100, 1)}%"
+        return f"{obj.rating_percent}%" if obj.likes_count + obj.dislikes_count else "0%"
 
     @admin.action(description="✅ Approve selected articles (publish)")
     def approve_articles(self, request, queryset):
-        updated = queryset.update(is_published=True)
+        affected = list(queryset.only('pk', 'author_id', 'category_id'))
+        updated = queryset.update(
+            is_published=True, is_rejected=False, version=F('version') + 1, updated_at=timezone.now(),
+        )
+        invalidate_articles(affected)
+        moderation.invalidate_pending_counts()
+        refresh_author_stats({a.author_id for a in affected})
+        enqueue_warm(a.pk for a in affected)
         self.message_user(request, f"{updated} article(s) approved successfully!", messages.SUCCESS)
 
     @admin.action(description="🚫 Unpublish selected articles")
     def unpublish_articles(self, request, queryset):
-        updated = queryset.update(is_published=False)
+        affected = list(queryset.only('pk', 'author_id', 'category_id'))
+        updated = queryset.update(is_published=False, version=F('version') + 1, updated_at=timezone.now())
+        invalidate_articles(affected)
+        moderation.invalidate_pending_counts()
+        refresh_author_stats({a.author_id for a in affected})
         self.message_user(request, f"{updated} article(s) unpublished.", messages.WARNING)
+
+    @admin.action(description="🔢 Recount votes and ratings (in background)")
+    def recount_articles(self, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        jobs.enqueue('refresh_article_stats', {'article_ids': ids})
+        self.message_user(request, f"Recount of {len(ids)} article(s) queued.", messages.INFO)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error',)
+    ordering = ('-id',)
+
+    actions = ['retry_jobs']
+
+    @admin.action(description="🔁 Retry selected jobs now")
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f"{updated} job(s) re-queued.", messages.SUCCESS)
@@ -0,0 +1,141 @@
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .models import Article, AuthorStats, Category
+from .pagination import LATEST_ORDERING, PAGE_SIZE, POPULAR_ORDERING, paginate_keyset
+
+MAX_LIMIT = 100
+
+# публичное имя поля -> путь для .values(); author и category приходят JOIN-ом в том же запросе
+ARTICLE_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'content': 'content',
+    'image': 'image',
+    'author': 'author__username',
+    'author_id': 'author_id',
+    'category': 'category__slug',
+    'category_name': 'category__name',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'likes': 'likes_count',
+    'dislikes': 'dislikes_count',
+    'rating_percent': 'rating_percent',
+    'rating': 'rating',
+    'rating_count': 'rating_count',
+    'popularity': 'popularity',
+}
+# content тяжёлый — в списках только по явному запросу
+DEFAULT_LIST_FIELDS = [name for name in ARTICLE_FIELDS if name != 'content']
+DEFAULT_DETAIL_FIELDS = list(ARTICLE_FIELDS)
+
+FEED_ORDERINGS = {
+    'latest': LATEST_ORDERING,
+    'popular': POPULAR_ORDERING,
+}
+
+
+class ApiError(Exception):
+    pass
+
+
+def _requested_fields(request, default):
+    raw = request.GET.get('fields')
+    if not raw:
+        return default
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in ARTICLE_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(ARTICLE_FIELDS)}.")
+    return fields
+
+
+def _limit(request):
+    try:
+        return max(1, min(MAX_LIMIT, int(request.GET.get('limit', PAGE_SIZE))))
+    except ValueError:
+        raise ApiError("limit must be an integer.")
+
+
+def _serialize(row, fields):
+    item = {name: row[ARTICLE_FIELDS[name]] for name in fields}
+    if 'image' in item:
+        item['image'] = default_storage.url(item['image']) if item['image'] else None
+    return item
+
+
+def _api_view(view_func):
+    @require_GET
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+    return wrapper
+
+
+@_api_view
+def article_list(request):
+    """
+    Published articles. Query params: feed=latest|popular, category=<slug>,
+    author=<username>, fields=a,b,c, limit, cursor.
+    """
+    feed = request.GET.get('feed', 'latest')
+    if feed not in FEED_ORDERINGS:
+        raise ApiError(f"feed must be one of: {', '.join(FEED_ORDERINGS)}.")
+    ordering = FEED_ORDERINGS[feed]
+    fields = _requested_fields(request, DEFAULT_LIST_FIELDS)
+
+    articles = Article.objects.filter(is_published=True)
+    if request.GET.get('category'):
+        articles = articles.filter(category__slug=request.GET['category'])
+    if request.GET.get('author'):
+        articles = articles.filter(author__username=request.GET['author'])
+
+    columns = {ARTICLE_FIELDS[name] for name in fields} | set(ordering)
+    page = paginate_keyset(articles.values(*columns), request.GET.get('cursor'), ordering, _limit(request))
+    return JsonResponse({
+        'results': [_serialize(row, fields) for row in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
+@_api_view
+def article_detail(request, pk):
+    fields = _requested_fields(request, DEFAULT_DETAIL_FIELDS)
+    row = (
+        Article.objects.filter(is_published=True, pk=pk)
+        .values(*{ARTICLE_FIELDS[name] for name in fields})
+        .first()
+    )
+    if row is None:
+        return JsonResponse({'error': 'Article not found.'}, status=404)
+    return JsonResponse(_serialize(row, fields))
+
+
+@_api_view
+def category_list(request):
+    categories = Category.objects.annotate(
+        articles_count=Count('articles', filter=Q(articles__is_published=True))
+    ).order_by('name').values('id', 'name', 'slug', 'articles_count')
+    return JsonResponse({'results': list(categories)})
+
+
+@_api_view
+def author_list(request):
+    """Users with at least one published article, newest accounts first."""
+    # счётчики из AuthorStats, как в feed_authors: без Count() по статьям на каждый запрос
+    authors = AuthorStats.objects.filter(published_count__gt=0).values(
+        'author_id', 'author__username', 'published_count',
+    )
+    page = paginate_keyset(authors, request.GET.get('cursor'), ('author_id',), _limit(request))
+    results = [
+        {'id': row['author_id'], 'username': row['author__username'], 'articles_count': row['published_count']}
+        for row in page
+    ]
+    return JsonResponse({'results': results, 'next_cursor': page.next_cursor})
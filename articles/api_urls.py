@@ -0,0 +1,9 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('articles/', api.article_list, name='api_article_list'),
+    path('articles/<int:pk>/', api.article_detail, name='api_article_detail'),
+    path('categories/', api.category_list, name='api_category_list'),
+    path('authors/', api.author_list, name='api_author_list'),
+]
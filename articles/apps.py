@@ -16,6 +16,8 @@ class ArticlesConfig(AppConfig):
     def ready(self):
         from django.db.models.signals import post_migrate
         from .models import Category
+        from . import signals, tasks  # noqa: F401
+        from habr import db  # noqa: F401  (connection_created -> pragmas SQLite)
 
         def seed_categories(sender, **kwargs):
             for name, slug in DEFAULT_CATEGORIES:
@@ -0,0 +1,121 @@
+"""
+Async versions of the hot interaction endpoints and feed read paths, for
+serving through habr/asgi.py. Reads go through the async ORM; writes that
+need a transaction reuse the services in a thread via sync_to_async, since
+transaction.atomic is not available in async code.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import IntegrityError
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import redirect, render
+
+from . import metrics, overlay
+from .models import Article, Bookmark, Category
+from .pagination import POPULAR_ORDERING, apaginate_keyset
+from .services import rate_article, toggle_vote
+
+
+@sync_to_async
+def _resolve_user(request):
+    # request.user ленивый и ходит в сессию/БД — вычисляем его вне event loop
+    return request.user if request.user.is_authenticated else None
+
+
+def async_login_required_post(view_func):
+    """Async counterpart of @login_required + @require_POST; passes the user to the view."""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        user = await _resolve_user(request)
+        if user is None:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, user, *args, **kwargs)
+    return wrapper
+
+
+async def _get_article(pk):
+    try:
+        return await Article.objects.aget(pk=pk)
+    except Article.DoesNotExist:
+        raise Http404("No Article matches the given query.")
+
+
+async def _vote(user, pk, value):
+    article = await _get_article(pk)
+    await sync_to_async(toggle_vote)(user, article, value)
+    return JsonResponse({
+        'likes': article.likes_count,
+        'dislikes': article.dislikes_count,
+        'rating_percent': article.rating_percent,
+    })
+
+
+@async_login_required_post
+async def article_like(request, user, pk):
+    return await _vote(user, pk, 1)
+
+
+@async_login_required_post
+async def article_dislike(request, user, pk):
+    return await _vote(user, pk, -1)
+
+
+@async_login_required_post
+async def article_bookmark_toggle(request, user, pk):
+    article = await _get_article(pk)
+    deleted, _ = await Bookmark.objects.filter(user=user, article=article).adelete()
+    bookmarked = not deleted
+    if bookmarked:
+        try:
+            await Bookmark.objects.acreate(user=user, article=article)
+        except IntegrityError:
+            # параллельный запрос успел создать закладку
+            pass
+    metrics.inc('habr_interaction_writes_total', kind='bookmark', source='single')
+
+    if request.META.get('HTTP_REFERER', '').endswith('/favorites/'):
+        return redirect('feed_favorites')
+    return JsonResponse({'bookmarked': bookmarked})
+
+
+@async_login_required_post
+async def article_rate(request, user, pk, value):
+    article = await _get_article(pk)
+    await sync_to_async(rate_article)(user, article, value)
+    return JsonResponse({'rating': article.rating, 'rating_count': article.rating_count})
+
+
+async def _render_feed(request, template_name, context):
+    # шаблоны синхронные (context processors трогают сессию) — рендерим в потоке
+    def _render():
+        overlay.annotate(request.user, context['page'])
+        return render(request, template_name, context)
+    return await sync_to_async(_render)()
+
+
+async def feed_all(request):
+    articles = Article.objects.filter(is_published=True).for_list()
+    page = await apaginate_keyset(articles, request.GET.get('cursor'))
+    return await _render_feed(request, 'articles/index.html', {'articles': page, 'page': page})
+
+
+async def feed_popular(request):
+    articles = Article.objects.filter(is_published=True).for_list()
+    page = await apaginate_keyset(articles, request.GET.get('cursor'), ordering=POPULAR_ORDERING)
+    return await _render_feed(request, 'articles/feed_popular.html', {'articles': page, 'page': page})
+
+
+async def feed_by_category(request, slug):
+    try:
+        category = await Category.objects.aget(slug=slug)
+    except Category.DoesNotExist:
+        raise Http404("No Category matches the given query.")
+    articles = category.articles.filter(is_published=True).for_list()
+    page = await apaginate_keyset(articles, request.GET.get('cursor'))
+    return await _render_feed(request, 'articles/feed_category.html', {
+        'category': category, 'articles': page, 'page': page,
+    })
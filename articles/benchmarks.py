@@ -0,0 +1,261 @@
+"""
+Per-view benchmark harness.
+
+Every named route in articles/urls.py has a scenario (method, who is logged
+in, which seeded objects fill the URL). run_benchmarks() drives each one
+through the test client, records latency percentiles and the worst SQL query
+count, and compares them with the view's budget. Budgets can be tightened or
+relaxed per view with settings.BENCHMARK_BUDGETS, e.g.
+``{'feed_all': {'queries': 6, 'p95_ms': 80}}``.
+"""
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+
+from . import urls
+from .models import Article, Category
+
+User = get_user_model()
+
+DEFAULT_BUDGET = {'queries': 10, 'p95_ms': 250}
+
+# запас к замеренным значениям на сиде по умолчанию; регрессия по запросам видна сразу
+BUDGETS = {
+    'feed_all': {'queries': 4},
+    'feed_popular': {'queries': 4},
+    'feed_by_category': {'queries': 5},
+    'article_search': {'queries': 5},
+    'feed_favorites': {'queries': 4},
+    'feed_for_you': {'queries': 8},
+    'feed_authors': {'queries': 4},
+    'author_detail': {'queries': 5},
+    'moderation_queue': {'queries': 5},
+    'feed_my_articles': {'queries': 4},
+    'article_detail': {'queries': 5},
+    'article_like': {'queries': 12},
+    'article_dislike': {'queries': 12},
+    'article_bookmark_toggle': {'queries': 8},
+    'article_rate': {'queries': 8},
+    'article_interactions_batch': {'queries': 15},
+    'export_stream': {'queries': 4, 'p95_ms': 1000},
+    'feed_all_async': {'queries': 4},
+    'feed_popular_async': {'queries': 4},
+    'feed_by_category_async': {'queries': 5},
+    'article_like_async': {'queries': 12},
+    'article_dislike_async': {'queries': 12},
+    'article_bookmark_toggle_async': {'queries': 8},
+    'article_rate_async': {'queries': 8},
+}
+
+
+@dataclass
+class Scenario:
+    method: str = 'get'
+    user: str = 'reader'          # ключ в fixtures или None для анонима
+    args: tuple = ()              # ключи fixtures, которые подставляются в URL
+    params: dict = field(default_factory=dict)
+    body: object = None           # ключ fixtures с JSON-телом для POST
+    form: str = None              # ключ fixtures с полями формы для POST
+
+
+SCENARIOS = {
+    'feed_all': Scenario(),
+    'feed_popular': Scenario(),
+    'feed_by_category': Scenario(args=('category',)),
+    'article_search': Scenario(params={'q': 'django cache'}),
+    'feed_authors': Scenario(),
+    'author_detail': Scenario(args=('author',)),
+    'feed_favorites': Scenario(),
+    'feed_for_you': Scenario(),
+    'feed_my_articles': Scenario(),
+    'article_detail': Scenario(args=('article',)),
+    'article_create': Scenario(),
+    'article_update': Scenario(args=('own_article',)),
+    'article_like': Scenario('post', args=('article',)),
+    'article_dislike': Scenario('post', args=('article',)),
+    'article_bookmark_toggle': Scenario('post', args=('article',)),
+    'article_rate': Scenario('post', args=('article', 'rating')),
+    'article_interactions_batch': Scenario('post', body='batch'),
+    'article_confirm': Scenario('post', args=('own_article',)),
+    'moderation_queue': Scenario(user='admin'),
+    'moderation_bulk': Scenario('post', user='admin', form='moderation'),
+    'moderation_approve': Scenario('post', user='admin', args=('own_article',)),
+    'export_stream': Scenario(user='admin', args=('export',), params={'format': 'csv'}),
+    'feed_all_async': Scenario(),
+    'feed_popular_async': Scenario(),
+    'feed_by_category_async': Scenario(args=('category',)),
+    'article_like_async': Scenario('post', args=('article',)),
+    'article_dislike_async': Scenario('post', args=('article',)),
+    'article_bookmark_toggle_async': Scenario('post', args=('article',)),
+    'article_rate_async': Scenario('post', args=('article', 'rating')),
+}
+
+# маршруты, которые сейчас нельзя прогнать осмысленно
+SKIPPED = {
+    'article_delete': "destructive; confirm template does not exist yet",
+}
+
+
+@dataclass
+class Result:
+    name: str
+    url: str
+    method: str
+    statuses: set
+    latencies: list
+    queries: int
+    budget: dict
+    failures: list = field(default_factory=list)
+
+    @property
+    def p50_ms(self):
+        return statistics.median(self.latencies) * 1000
+
+    @property
+    def p95_ms(self):
+        ordered = sorted(self.latencies)
+        return ordered[max(0, int(round(len(ordered) * 0.95)) - 1)] * 1000
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Run the block against a fresh, migrated SQLite file instead of the
+    configured database. A file rather than in-memory SQLite, so that threads
+    share it. A configured replica alias is pointed at the same file, so
+    replica-routed reads never reach the real data. Uploads go to a local
+    directory next to it. Database settings are restored afterwards.
+    """
+    tmpdir = tempfile.mkdtemp(prefix='habr-bench-')
+    saved_test = dict(connection.settings_dict.get('TEST') or {})
+    connection.settings_dict['TEST'] = dict(saved_test, NAME=os.path.join(tmpdir, 'bench.sqlite3'))
+    replica = connections['replica'] if 'replica' in connections.settings else None
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    if replica is not None:
+        replica_name = replica.settings_dict['NAME']
+        replica.close()
+        replica.creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        # DEBUG и SQL-инструментирование выключены, чтобы не искажать замеры
+        with override_settings(
+            DEBUG=False, ALLOWED_HOSTS=['*'], SQL_INSTRUMENTATION_SAMPLE_RATE=0,
+            DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+            MEDIA_ROOT=os.path.join(tmpdir, 'media'),
+        ):
+            yield
+    finally:
+        if replica is not None:
+            replica.close()
+            replica.settings_dict['NAME'] = replica_name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST'] = saved_test
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def route_names():
+    """Unique URL names declared in articles/urls.py, in declaration order."""
+    names = []
+    for pattern in urls.urlpatterns:
+        if isinstance(pattern, URLPattern) and pattern.name and pattern.name not in names:
+            names.append(pattern.name)
+    return names
+
+
+def budget_for(name):
+    budget = dict(DEFAULT_BUDGET, **BUDGETS.get(name, {}))
+    budget.update(getattr(settings, 'BENCHMARK_BUDGETS', {}).get(name, {}))
+    return budget
+
+
+def make_fixtures():
+    """Pick the objects scenarios run against from already seeded data."""
+    article = Article.objects.filter(is_published=True).order_by('-popularity', '-id').first()
+    if article is None:
+        raise ValueError("No published articles; seed the database first")
+    reader = User.objects.exclude(pk=article.author_id).order_by('pk').first() or article.author
+    admin, _ = User.objects.get_or_create(
+        username='bench-admin', defaults={'role': User.Roles.SUPERADMIN, 'is_staff': True},
+    )
+    own_article = Article.objects.create(
+        author=reader, category=article.category, title='Benchmark draft',
+        content='Benchmark draft', image='articles/bench.jpg', is_published=False,
+    )
+    batch = [{'type': 'like', 'article': pk} for pk in
+             Article.objects.filter(is_published=True).order_by('-id').values_list('pk', flat=True)[:20]]
+    return {
+        'reader': reader,
+        'admin': admin,
+        'article': article.pk,
+        'author': article.author.username,
+        'own_article': own_article.pk,
+        'category': (article.category or Category.objects.first()).slug,
+        'rating': 4,
+        'export': 'votes',
+        'batch': {'interactions': batch},
+        'moderation': {'action': 'approve', 'articles': [own_article.pk]},
+    }
+
+
+def _request(client, name, scenario, fixtures):
+    url = reverse(name, args=[fixtures[key] for key in scenario.args])
+    if scenario.method == 'post' and scenario.body:
+        response = client.post(url, data=json.dumps(fixtures[scenario.body]), content_type='application/json')
+    elif scenario.method == 'post' and scenario.form:
+        response = client.post(url, fixtures[scenario.form])
+    else:
+        response = getattr(client, scenario.method)(url, scenario.params)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return url, response.status_code
+
+
+def run_scenario(name, fixtures, iterations=20, warmup=2):
+    scenario = SCENARIOS[name]
+    client = Client(raise_request_exception=False)
+    if scenario.user:
+        client.force_login(fixtures[scenario.user])
+
+    for _ in range(warmup):
+        _request(client, name, scenario, fixtures)
+
+    latencies, statuses, worst = [], set(), 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            url, status = _request(client, name, scenario, fixtures)
+            latencies.append(time.perf_counter() - started)
+        statuses.add(status)
+        worst = max(worst, len(ctx))
+
+    result = Result(name, url, scenario.method.upper(), statuses, latencies, worst, budget_for(name))
+    if any(status >= 400 for status in statuses):
+        result.failures.append(f"status {sorted(statuses)}")
+    if result.queries > result.budget['queries']:
+        result.failures.append(f"{result.queries} queries > {result.budget['queries']}")
+    if result.p95_ms > result.budget['p95_ms']:
+        result.failures.append(f"p95 {result.p95_ms:.1f} ms > {result.budget['p95_ms']} ms")
+    return result
+
+
+def run_benchmarks(names=None, iterations=20, fixtures=None):
+    """
+    Benchmark the given routes (default: every scenario). Routes declared in
+    articles/urls.py without a scenario or a SKIPPED entry are reported as
+    failures, so a new view cannot slip past the budgets unnoticed.
+    """
+    fixtures = fixtures or make_fixtures()
+    results = [run_scenario(name, fixtures, iterations) for name in (names or SCENARIOS)]
+    missing = [name for name in route_names() if name not in SCENARIOS and name not in SKIPPED]
+    return results, missing
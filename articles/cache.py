@@ -0,0 +1,185 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from habr.db import is_pinned, read_from_primary
+
+from . import jobs
+from .models import Article, Category
+
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# шаблоны, содержащие {% cache %} по (pk, version); рендер заполняет кэш
+FRAGMENT_TEMPLATES = [
+    'articles/cards/card.html',
+    'articles/cards/grid_card.html',
+    'articles/cards/detail_body.html',
+]
+
+# области инвалидации: 'feeds' — общая и популярная ленты, 'category:<slug>', 'article:<pk>'
+FEEDS_SCOPE = 'feeds'
+
+
+def category_scope(slug):
+    return f'category:{slug}'
+
+
+def article_scope(pk):
+    return f'article:{pk}'
+
+
+def _state_key(scope):
+    return f'page-state:{scope}'
+
+
+def scope_states(scopes):
+    """
+    Current (token, timestamp) per scope. A scope missing from the cache
+    (first hit or eviction) starts fresh, which only costs one extra render.
+    """
+    keys = {_state_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    states = {}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, (time.time_ns(), time.time()), None)
+            found[key] = cache.get(key)
+        states[scope] = found[key]
+    return states
+
+
+def bump_scopes(*scopes):
+    now = (time.time_ns(), time.time())
+    cache.set_many({_state_key(scope): now for scope in scopes}, None)
+
+
+def invalidate_article(article, affects_feeds=True, previous_category_id=None):
+    """
+    Drop cached pages showing the article: its detail page and, if it is (or
+    was) listed, the feeds, including the category it was just moved out of.
+    """
+    scopes = [article_scope(article.pk)]
+    if affects_feeds:
+        scopes.append(FEEDS_SCOPE)
+        category_ids = {article.category_id, previous_category_id} - {None}
+        if category_ids:
+            slugs = Category.objects.filter(pk__in=category_ids).values_list('slug', flat=True)
+            scopes.extend(category_scope(slug) for slug in slugs)
+    bump_scopes(*scopes)
+
+
+def invalidate_articles(articles):
+    """Batch version of invalidate_article for bulk write paths: one category lookup for all rows."""
+    articles = list(articles)
+    category_ids = {a.category_id for a in articles if a.category_id is not None}
+    slugs = dict(Category.objects.filter(pk__in=category_ids).values_list('pk', 'slug')) if category_ids else {}
+    scopes = {article_scope(a.pk) for a in articles}
+    if articles:
+        scopes.add(FEEDS_SCOPE)
+    scopes.update(category_scope(slugs[a.category_id]) for a in articles if a.category_id in slugs)
+    bump_scopes(*scopes)
+
+
+def touch_articles(queryset):
+    """
+    Bump the version of every article in queryset, so fragments keyed by
+    (pk, version) re-render, and drop their cached pages. For changes shown
+    on the cards that do not save the articles themselves (category or
+    author renames).
+    """
+    affected = list(queryset.only('pk', 'category_id'))
+    if affected:
+        Article.objects.filter(pk__in=[a.pk for a in affected]).update(version=F('version') + 1)
+        transaction.on_commit(lambda: invalidate_articles(affected))
+    return len(affected)
+
+
+def cache_is_shared():
+    """
+    False for the per-process local-memory cache: fragments rendered by the
+    worker or a management command would never reach the web processes.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def enqueue_warm(article_ids, unique_key=None):
+    """Queue pre-rendering of the articles' fragments; a no-op unless the cache is shared."""
+    if cache_is_shared():
+        jobs.enqueue('warm_article_cache', {'article_ids': list(article_ids)}, unique_key=unique_key)
+
+
+def warm_fragments(articles, batch_size=200):
+    """Pre-render the cached card and detail fragments of published articles; returns how many."""
+    queryset = articles.filter(is_published=True).select_related('author', 'category').defer('content')
+    total = 0
+    for article in queryset.iterator(chunk_size=batch_size):
+        for template_name in FRAGMENT_TEMPLATES:
+            render_to_string(template_name, {'a': article})
+        total += 1
+    return total
+
+
+def anonymous_page_cache(get_scopes, timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Cache whole GET responses for anonymous visitors and answer conditional
+    requests with 304.
+
+    get_scopes(request, *args, **kwargs) names the invalidation scopes the
+    page depends on; the ETag and cache key are derived from their current
+    tokens plus the full path, so bumping any scope makes both stale at once.
+    Authenticated users (and visitors with pending flash messages or an
+    active read-your-writes pin) always get a freshly rendered page, and so
+    does everyone without a shared cache: scope tokens bumped by one worker
+    process, run_worker or a management command would not reach the others,
+    which would keep serving the old page and answering its ETag. Cache
+    misses are rendered from the primary database: a lagging replica read
+    right after an invalidation would otherwise be stored under the new
+    scope token and outlive the write.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+                or 'messages' in request.COOKIES
+                or is_pinned(request)
+                or not cache_is_shared()
+            ):
+                return view_func(request, *args, **kwargs)
+
+            states = scope_states(get_scopes(request, *args, **kwargs))
+            fingerprint = '|'.join(f'{scope}={token}' for scope, (token, _) in sorted(states.items()))
+            token = hashlib.md5(f'{fingerprint}|{request.get_full_path()}'.encode()).hexdigest()
+            etag = quote_etag(token)
+            last_modified = int(max(ts for _, ts in states.values()))
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                cache_key = f'page:{token}'
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    content, content_type = cached
+                    response = HttpResponse(content, content_type=content_type)
+                else:
+                    with read_from_primary():
+                        response = view_func(request, *args, **kwargs)
+                    if response.status_code != 200 or response.streaming or response.cookies:
+                        return response
+                    cache.set(cache_key, (response.content, response['Content-Type']), timeout)
+
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,43 @@
+"""
+Cache backends that count hits and misses into articles.metrics.
+
+Only get() is wrapped: the stock get_many() of these backends goes through
+it, and so does the {% cache %} tag. Keys are grouped by the prefixes this
+project uses, so the metric has a fixed set of label values.
+"""
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+KEY_KINDS = (
+    ('template.cache.', 'fragment'),
+    ('page-state:', 'page_state'),
+    ('page:', 'page'),
+    ('sql-instrumentation:', 'instrumentation'),
+)
+
+_MISSING = object()
+
+
+def key_kind(key):
+    for prefix, kind in KEY_KINDS:
+        if key.startswith(prefix):
+            return kind
+    return 'other'
+
+
+class MetricsCacheMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        hit = value is not _MISSING
+        metrics.inc('habr_cache_requests_total', kind=key_kind(str(key)), result='hit' if hit else 'miss')
+        return value if hit else default
+
+
+class LocMemMetricsCache(MetricsCacheMixin, LocMemCache):
+    pass
+
+
+class FileBasedMetricsCache(MetricsCacheMixin, FileBasedCache):
+    pass
@@ -0,0 +1,80 @@
+"""
+Resized copies of Article.image for feeds and the detail page.
+
+Variants are produced with Pillow once per uploaded file (after the save that
+changed the image commits), written through the default storage next to the
+original, and their URLs are cached in Article.image_variants so rendering a
+card never touches the storage backend. Works with FileSystemStorage as well
+as Cloudinary.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .cache import invalidate_article
+from .models import Article
+
+VARIANT_WIDTHS = (320, 640, 1024)
+VARIANT_DIR = 'articles/variants'
+QUALITY = 80
+
+if features.check('webp'):
+    VARIANT_FORMAT, VARIANT_EXT = 'WEBP', 'webp'
+else:
+    VARIANT_FORMAT, VARIANT_EXT = 'JPEG', 'jpg'
+
+
+def variants_stale(article):
+    return bool(article.image) and article.image_variants.get('source') != article.image.name
+
+
+def render_variants(source):
+    """Yield (width, bytes) per VARIANT_WIDTHS entry narrower than the source, plus the source width if it is small."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        keep = ('RGB', 'RGBA') if VARIANT_FORMAT == 'WEBP' else ('RGB',)
+        if image.mode not in keep:
+            image = image.convert('RGBA' if 'RGBA' in keep and 'A' in image.getbands() else 'RGB')
+        widths = [w for w in VARIANT_WIDTHS if w < image.width]
+        if image.width <= VARIANT_WIDTHS[-1]:
+            widths.append(image.width)  # узкий оригинал — только перекодируем
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            buffer = BytesIO()
+            resized.save(buffer, VARIANT_FORMAT, quality=QUALITY, optimize=True, method=4)
+            yield width, buffer.getvalue()
+
+
+def build_variants(article):
+    """
+    Generate and store the variants of article.image, save their URLs on the
+    article and drop cached pages that show it. Returns the stored mapping;
+    an unreadable image is recorded with no widths so it is not retried on
+    every save.
+    """
+    source_name = article.image.name
+    widths = {}
+    try:
+        with default_storage.open(source_name, 'rb') as source:
+            stem = os.path.splitext(os.path.basename(source_name))[0]
+            for width, data in render_variants(source):
+                name = default_storage.save(
+                    f'{VARIANT_DIR}/{stem}-{width}.{VARIANT_EXT}', ContentFile(data)
+                )
+                widths[str(width)] = default_storage.url(name)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        widths = {}
+
+    variants = {'source': source_name, 'widths': widths}
+    # version растёт, чтобы фрагменты карточек перерендерились с srcset
+    Article.objects.filter(pk=article.pk, image=source_name).update(
+        image_variants=variants, version=F('version') + 1,
+    )
+    article.image_variants = variants
+    invalidate_article(article, affects_feeds=article.is_published)
+    return variants
@@ -0,0 +1,182 @@
+"""
+Per-request SQL instrumentation.
+
+SQLInstrumentationMiddleware wraps a sampled share of requests in
+connection.execute_wrapper and records every query: its fingerprint (the SQL
+with IN-lists collapsed, params are already separate), duration and origin —
+the innermost template node being rendered, or else the nearest frame of
+project code. Sampled responses get X-SQL-* headers and a Server-Timing
+entry; a per-view summary with the worst repeated fingerprints (N+1
+candidates) is kept in the cache for the admin report.
+"""
+import hashlib
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template.base import Node
+
+REPORT_KEY = 'sql-instrumentation:report'
+REPORT_TIMEOUT = 60 * 60 * 24
+MAX_VIEWS = 200
+MAX_FINGERPRINTS = 10
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_PROJECT_ROOT = str(settings.BASE_DIR)
+_SKIP_PATHS = ('site-packages', 'dist-packages', __file__.rsplit('.', 1)[0])
+
+
+def sample_rate():
+    return getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0)
+
+
+def duplicate_threshold():
+    return getattr(settings, 'SQL_INSTRUMENTATION_DUPLICATE_THRESHOLD', 3)
+
+
+def fingerprint(sql):
+    normalized = _IN_LIST_RE.sub('IN (...)', ' '.join(sql.split()))
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+def query_origin():
+    """
+    Where the current query comes from: 'template.html:LINE' when it is issued
+    while a template node renders (lazy FK access in {{ a.author.username }}),
+    otherwise 'path/to/module.py:LINE in func' of the nearest project frame.
+    """
+    frame = sys._getframe(2)
+    code_origin = None
+    while frame is not None:
+        node = frame.f_locals.get('self') if frame.f_code.co_name == 'render_annotated' else None
+        if isinstance(node, Node) and node.origin is not None and node.token is not None:
+            return f"{node.origin.template_name or node.origin.name}:{node.token.lineno}"
+        filename = frame.f_code.co_filename
+        if code_origin is None and filename.startswith(_PROJECT_ROOT) \
+                and not any(part in filename for part in _SKIP_PATHS):
+            code_origin = f"{filename[len(_PROJECT_ROOT) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return code_origin or '?'
+
+
+class QueryRecorder:
+    """execute_wrapper hook collecting queries of one request."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        origin = query_origin()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started, origin))
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def repeated(self, threshold=None):
+        """Fingerprints issued at least `threshold` times: [(fp, sql, count, origins)] by count."""
+        threshold = threshold or duplicate_threshold()
+        counts = Counter()
+        statements = {}
+        origins = defaultdict(Counter)
+        for sql, _, origin in self.queries:
+            fp, normalized = fingerprint(sql)
+            counts[fp] += 1
+            statements[fp] = normalized
+            origins[fp][origin] += 1
+        return [
+            (fp, statements[fp], count, [origin for origin, _ in origins[fp].most_common(3)])
+            for fp, count in counts.most_common() if count >= threshold
+        ]
+
+
+def record_report(view_name, path, recorder):
+    # кэш общий для процессов при FileBasedCache; гонки между запросами допустимы — это выборка
+    report = cache.get(REPORT_KEY) or {}
+    entry = report.get(view_name) or {
+        'requests': 0, 'queries': 0, 'time_ms': 0.0, 'max_queries': 0, 'last_path': '', 'repeated': {},
+    }
+    entry['requests'] += 1
+    entry['queries'] += len(recorder.queries)
+    entry['time_ms'] += recorder.total_time * 1000
+    entry['max_queries'] = max(entry['max_queries'], len(recorder.queries))
+    entry['last_path'] = path
+    for fp, sql, count, origins in recorder.repeated():
+        seen = entry['repeated'].get(fp)
+        if seen is None or count > seen['count']:
+            entry['repeated'][fp] = {'sql': sql[:500], 'count': count, 'origins': origins}
+    if len(entry['repeated']) > MAX_FINGERPRINTS:
+        worst = sorted(entry['repeated'].items(), key=lambda item: -item[1]['count'])[:MAX_FINGERPRINTS]
+        entry['repeated'] = dict(worst)
+    report[view_name] = entry
+    if len(report) > MAX_VIEWS:
+        report = dict(sorted(report.items(), key=lambda item: -item[1]['requests'])[:MAX_VIEWS])
+    cache.set(REPORT_KEY, report, REPORT_TIMEOUT)
+
+
+def get_report():
+    """Per-view summaries, the most query-hungry views first."""
+    report = cache.get(REPORT_KEY) or {}
+    rows = []
+    for view_name, entry in report.items():
+        rows.append(dict(
+            entry,
+            view=view_name,
+            avg_queries=entry['queries'] / entry['requests'],
+            avg_time_ms=entry['time_ms'] / entry['requests'],
+            repeated=sorted(entry['repeated'].values(), key=lambda r: -r['count']),
+        ))
+    return sorted(rows, key=lambda row: -row['avg_queries'])
+
+
+def reset_report():
+    cache.delete(REPORT_KEY)
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Instrument a random SQL_INSTRUMENTATION_SAMPLE_RATE share of requests
+    (0 disables it). Unsampled requests pay for one random() call. Queries
+    run while a StreamingHttpResponse is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = sample_rate()
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        repeated = recorder.repeated()
+        db_ms = recorder.total_time * 1000
+        response['X-SQL-Queries'] = str(len(recorder.queries))
+        response['X-SQL-Time-ms'] = f"{db_ms:.1f}"
+        response['X-SQL-Repeated'] = str(len(repeated))
+        # где именно повторяется запрос — только для staff/DEBUG, чтобы не светить внутренности наружу
+        user = getattr(request, 'user', None)
+        if repeated and (settings.DEBUG or getattr(user, 'is_staff', False)):
+            fp, _, count, origins = repeated[0]
+            response['X-SQL-Worst-Repeated'] = f"{fp} x{count} at {origins[0]}"
+        response['Server-Timing'] = f"db;dur={db_ms:.1f}"
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or request.path
+        record_report(view_name, request.path, recorder)
+        return response
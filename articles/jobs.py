@@ -0,0 +1,155 @@
+"""
+Database-backed job queue.
+
+enqueue() inserts a Job row in the caller's transaction, so a job is only
+visible to workers once the write that needed it commits. Workers (the
+run_worker command) claim due jobs with a conditional UPDATE — portable to
+SQLite, which has no SELECT ... SKIP LOCKED — run the registered task
+function with the payload as keyword arguments, and on failure re-queue the
+job with exponential backoff until max_attempts is reached. Jobs left
+'running' by a crashed worker are re-queued after LOCK_TIMEOUT.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+BACKOFF_BASE = 5          # секунд до первого повтора
+BACKOFF_MAX = 60 * 60
+LOCK_TIMEOUT = timedelta(minutes=10)
+KEEP_FINISHED = timedelta(days=1)
+
+
+def task(name):
+    """Register a function as the handler of jobs called `name`."""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, unique_key='', max_attempts=5):
+    """
+    Queue a job; returns it, or None when a job with the same unique_key is
+    already waiting. With settings.JOBS_EAGER the task runs right after the
+    current transaction commits instead (development without a worker).
+    """
+    if name not in TASKS:
+        raise KeyError(f"Unknown job {name!r}")
+    payload = payload or {}
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: TASKS[name](**payload))
+        return None
+    if unique_key and Job.objects.filter(unique_key=unique_key, status=Job.Status.QUEUED).exists():
+        return None
+    return Job.objects.create(
+        name=name, payload=payload, unique_key=unique_key, max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_many(name, payloads, unique_keys=None, max_attempts=5):
+    """
+    Queue one job per payload with a single bulk INSERT, for bulk write paths
+    whose objects are new (no unique_key check against waiting jobs).
+    """
+    if name not in TASKS:
+        raise KeyError(f"Unknown job {name!r}")
+    payloads = list(payloads)
+    if getattr(settings, 'JOBS_EAGER', False):
+        for payload in payloads:
+            transaction.on_commit(lambda payload=payload: TASKS[name](**payload))
+        return []
+    run_at = timezone.now()
+    unique_keys = unique_keys or [''] * len(payloads)
+    return Job.objects.bulk_create([
+        Job(name=name, payload=payload, unique_key=key, max_attempts=max_attempts, run_at=run_at)
+        for payload, key in zip(payloads, unique_keys)
+    ])
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def requeue_stale():
+    now = timezone.now()
+    return Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=now - LOCK_TIMEOUT).update(
+        status=Job.Status.QUEUED, locked_by='', locked_at=None, run_at=now,
+    )
+
+
+def claim(worker_id, limit=1):
+    """Atomically take up to `limit` due jobs for worker_id."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now)
+        .order_by('run_at', 'id').values_list('id', flat=True)[:limit * 4]
+    )
+    claimed = []
+    for job_id in candidates:
+        # выигрывает тот воркер, чей UPDATE первым сменил статус
+        won = Job.objects.filter(pk=job_id, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if won:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Execute a claimed job and record the outcome; returns True on success."""
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise KeyError(f"Unknown job {job.name!r}")
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s failed (attempt %s/%s)", job, job.attempts, job.max_attempts)
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            changes = {'status': Job.Status.FAILED, 'finished_at': now}
+        else:
+            changes = {'status': Job.Status.QUEUED, 'run_at': now + backoff(job.attempts)}
+        Job.objects.filter(pk=job.pk).update(locked_by='', locked_at=None, last_error=error[-5000:], **changes)
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.Status.DONE, finished_at=timezone.now(), locked_by='', locked_at=None,
+    )
+    return True
+
+
+def run_pending(worker_id='inline', limit=None):
+    """Run due jobs until none are left (or `limit` ran). Returns (succeeded, failed)."""
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        jobs = claim(worker_id)
+        if not jobs:
+            break
+        if run_job(jobs[0]):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def purge_finished(older_than=KEEP_FINISHED):
+    deleted, _ = Job.objects.filter(
+        status=Job.Status.DONE, finished_at__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
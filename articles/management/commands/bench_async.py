@@ -0,0 +1,138 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from articles.benchmarks import throwaway_database
+from articles.models import Article, Category
+
+User = get_user_model()
+
+
+def _describe_failure(response):
+    # exc_info есть, только если исключение дошло до обработчика; иначе — просто код ответа
+    if response.exc_info:
+        return f"HTTP {response.status_code}: {response.exc_info[1]!r}"
+    return f"HTTP {response.status_code}"
+
+
+def _summary(label, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return (
+        f"{label}: {len(latencies)} request(s) in {elapsed:.2f}s, "
+        f"{len(latencies) / max(elapsed, 1e-6):.0f} req/s, "
+        f"p50 {statistics.median(latencies) * 1000 if latencies else 0:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms, {errors} error(s)"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) and async (ASGI) like endpoints under many concurrent voters. "
+        "Runs against a throwaway database, never the configured one; fails if any request errors"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=20, help="Votes per voter")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads")
+        parser.add_argument('--feed', action='store_true', help="Also benchmark the latest feed")
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            self._run(options)
+
+    def _run(self, options):
+        author = User.objects.create_user('bench-author', password=None)
+        category = Category.objects.create(name='Bench', slug='bench')
+        article = Article.objects.create(
+            author=author, category=category, title='Bench', content='Bench',
+            image='articles/bench.jpg', is_published=True,
+        )
+        voters = [User.objects.create_user(f'bench-voter-{i}', password=None) for i in range(options['voters'])]
+        rounds = options['requests']
+
+        self.stdout.write(f"{len(voters)} voter(s) x {rounds} vote(s) on article {article.pk}")
+        runs = [
+            self._bench_wsgi(voters, reverse('article_like', args=[article.pk]), rounds, options['threads']),
+            self._bench_asgi(voters, reverse('article_like_async', args=[article.pk]), rounds),
+        ]
+        if options['feed']:
+            runs.append(self._bench_wsgi(voters, reverse('feed_all'), rounds, options['threads'], 'get'))
+            runs.append(self._bench_asgi(voters, reverse('feed_all_async'), rounds, 'get'))
+
+        failures = []
+        for summary, run_failures in runs:
+            self.stdout.write(summary)
+            failures += run_failures
+
+        article.refresh_from_db()
+        self.stdout.write(
+            f"Final counters: {article.likes_count} like(s), {article.dislikes_count} dislike(s)."
+        )
+        if failures:
+            raise CommandError(f"{len(failures)} request(s) failed; first: {failures[0]}")
+        self.stdout.write(self.style.SUCCESS("All requests succeeded."))
+
+    def _bench_wsgi(self, voters, url, rounds, threads, method='post'):
+        clients = []
+        for voter in voters:
+            client = Client(raise_request_exception=False)
+            client.force_login(voter)
+            clients.append(client)
+
+        def run_voter(client):
+            latencies, failures = [], []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                response = getattr(client, method)(url)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures.append(_describe_failure(response))
+            return latencies, failures
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(run_voter, clients))
+        elapsed = time.perf_counter() - started
+        failures = [f for _, fs in results for f in fs]
+        return _summary(
+            f"WSGI {method.upper()} {url} ({threads} threads)",
+            [lat for lats, _ in results for lat in lats], len(failures), elapsed,
+        ), failures
+
+    def _bench_asgi(self, voters, url, rounds, method='post'):
+        # force_login синхронный — сессии создаём до запуска event loop
+        clients = []
+        for voter in voters:
+            client = AsyncClient(raise_request_exception=False)
+            client.force_login(voter)
+            clients.append(client)
+
+        async def run_voter(client):
+            latencies, failures = [], []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                response = await getattr(client, method)(url)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures.append(_describe_failure(response))
+            return latencies, failures
+
+        async def run_all():
+            return await asyncio.gather(*(run_voter(client) for client in clients))
+
+        started = time.perf_counter()
+        results = asyncio.run(run_all())
+        elapsed = time.perf_counter() - started
+        failures = [f for _, fs in results for f in fs]
+        return _summary(
+            f"ASGI {method.upper()} {url} ({len(clients)} coroutines)",
+            [lat for lats, _ in results for lat in lats], len(failures), elapsed,
+        ), failures
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from articles.benchmarks import SKIPPED, run_benchmarks, throwaway_database
+from articles.seed import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and benchmark every route in articles/urls.py; "
+        "fails when a view exceeds its query or latency budget"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Route names (default: all)")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--articles', type=int, default=2000)
+        parser.add_argument('--votes', type=int, default=20000)
+        parser.add_argument('--ratings', type=int, default=8000)
+        parser.add_argument('--bookmarks', type=int, default=4000)
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            seed(
+                users=options['users'], articles=options['articles'], votes=options['votes'],
+                ratings=options['ratings'], bookmarks=options['bookmarks'],
+                random_seed=options['random_seed'], stdout=self.stdout,
+            )
+            try:
+                results, missing = run_benchmarks(options['names'] or None, options['iterations'])
+            except KeyError as exc:
+                raise CommandError(f"Unknown route {exc}")
+
+        self.stdout.write(f"{'view':32} {'method':6} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8}  budget")
+        for r in results:
+            line = (
+                f"{r.name:32} {r.method:6} {r.p50_ms:8.1f} {r.p95_ms:8.1f} {r.queries:8}  "
+                f"{r.budget['queries']} q / {r.budget['p95_ms']} ms"
+            )
+            self.stdout.write(self.style.ERROR(line + '  ' + '; '.join(r.failures)) if r.failures else line)
+        for name, reason in SKIPPED.items():
+            self.stdout.write(f"{name:32} skipped: {reason}")
+
+        failed = [r.name for r in results if r.failures]
+        if missing:
+            self.stderr.write(f"Routes without a benchmark scenario: {', '.join(missing)}")
+        if failed or missing:
+            raise CommandError(f"{len(failed)} view(s) over budget, {len(missing)} route(s) not covered.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} view(s) within budget."))
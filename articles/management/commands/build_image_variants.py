@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from articles.images import build_variants, variants_stale
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = "Generate resized image variants for articles whose variants are missing or stale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild even up-to-date variants")
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for article in Article.objects.exclude(image='').only('id', 'image', 'image_variants', 'category_id',
+                                                                'is_published').iterator(chunk_size=200):
+            if not (options['all'] or variants_stale(article)):
+                continue
+            if build_variants(article)['widths']:
+                built += 1
+            else:
+                failed += 1
+                self.stderr.write(f"Article {article.pk}: could not read {article.image.name}")
+        self.stdout.write(self.style.SUCCESS(f"Variants built for {built} article(s), {failed} unreadable."))
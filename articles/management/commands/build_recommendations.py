@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from articles import recommendations
+from articles.cache import cache_is_shared
+
+
+class Command(BaseCommand):
+    help = "Precompute and cache the For You feed of every user with votes, ratings or bookmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=recommendations.USER_BATCH,
+                            help="Users scored per NumPy batch")
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            raise CommandError(
+                "The default cache is per-process local memory: rankings computed here would vanish with "
+                "this process. Set HABR_CACHE_DIR (or another shared backend) first."
+            )
+        scored = recommendations.refresh(recommendations.active_user_ids(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Recommendations cached for {scored} user(s) for {recommendations.CACHE_TTL // 60} min."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from articles import related
+
+
+class Command(BaseCommand):
+    help = "Recompute the related-articles index for articles whose votes, bookmarks or text changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every published article")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Articles per similarity product")
+
+    def handle(self, *args, **options):
+        rebuilt = related.refresh(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Related articles rebuilt for {rebuilt} article(s)."))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from articles import export
+
+
+class Command(BaseCommand):
+    help = "Stream Article / LikeDislike / Rating / Bookmark rows as NDJSON or CSV, optionally since a watermark"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(export.EXPORTS))
+        parser.add_argument('--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument('--output', help="File path (default: stdout)")
+        parser.add_argument('--since', help="ISO datetime; articles only, compared with updated_at")
+        parser.add_argument(
+            '--since-id', type=int,
+            help="Resume after this id; for votes/ratings/bookmarks only new rows, not changes or deletions",
+        )
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = export.parse_since(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since datetime: {options['since']}")
+
+        name = options['name']
+        last = None
+
+        def tracked(rows):
+            nonlocal last
+            for row in rows:
+                last = row
+                yield row
+
+        rows = tracked(export.export_rows(name, since, options['since_id'], options['chunk_size']))
+        chunks = export.render(name, rows, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+                fh.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+
+        if last is not None:
+            mark = export.watermark(name, last)
+            args = ' '.join(
+                f"--since {value.isoformat()}" if key == 'since' else f"--since-id {value}"
+                for key, value in mark.items()
+            )
+            self.stderr.write(f"Next incremental run: export_data {name} {args}")
@@ -0,0 +1,252 @@
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from articles import images, jobs, search
+from articles.cache import FEEDS_SCOPE, article_scope, bump_scopes, category_scope
+from articles.models import Article, Bookmark, Category, LikeDislike, Rating
+from articles.services import refresh_article_stats, refresh_author_stats
+
+User = get_user_model()
+
+# порядок сброса внутри чанка: сначала то, на что ссылаются остальные записи
+RECORD_TYPES = ('user', 'category', 'article', 'vote', 'rating', 'bookmark')
+FINISH_BATCH = 500
+
+
+class RecordError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a JSONL file of users, categories, articles, votes, ratings and bookmarks "
+        "into the database with batched bulk_create; resumable from a checkpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk_create statement")
+        parser.add_argument('--chunk-lines', type=int, default=10000, help="Lines per transaction / checkpoint")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <path>.checkpoint)")
+        parser.add_argument('--resume', action='store_true', help="Continue after the last committed chunk")
+        parser.add_argument('--strict', action='store_true', help="Abort on the first invalid line")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+        self.batch_size = options['batch_size']
+        self.strict = options['strict']
+        checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+
+        state = {'offset': 0, 'line': 0, 'refs': {}, 'imported': 0, 'errors': 0, 'touched': []}
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding='utf-8') as fh:
+                state.update(json.load(fh))
+            self.stdout.write(f"Resuming at line {state['line']}.")
+
+        # карты поиска в памяти: один запрос на категории, пользователи — пачками по мере надобности
+        self.categories = dict(Category.objects.values_list('slug', 'pk'))
+        self.users = {}
+        self.refs = state['refs']
+        self.errors = state['errors']
+        touched = set(state['touched'])
+
+        started = time.monotonic()
+        started_line = state['line']
+        with open(path, 'rb') as fh:
+            fh.seek(state['offset'])
+            while True:
+                chunk, count = self._read_chunk(fh, state, options['chunk_lines'])
+                if not count:
+                    break
+                with transaction.atomic():
+                    imported, chunk_touched = self._flush(chunk)
+                touched |= chunk_touched
+                state.update(
+                    offset=fh.tell(),
+                    imported=state['imported'] + imported,
+                    errors=self.errors,
+                    touched=sorted(touched),
+                )
+                self._save_checkpoint(checkpoint_path, state)
+
+                elapsed = max(time.monotonic() - started, 1e-6)
+                rate = (state['line'] - started_line) / elapsed
+                self.stdout.write(
+                    f"line {state['line']}: {state['imported']} row(s) imported, "
+                    f"{state['errors']} error(s), {rate:.0f} lines/s"
+                )
+
+        self._finish(touched)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Import finished: {state['imported']} row(s), {state['errors']} error(s)."
+        ))
+
+    def _read_chunk(self, fh, state, chunk_lines):
+        chunk = {kind: [] for kind in RECORD_TYPES}
+        count = 0
+        while count < chunk_lines:
+            raw = fh.readline()
+            if not raw:
+                break
+            state['line'] += 1
+            count += 1
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+                kind = record.get('type')
+                if kind not in chunk:
+                    raise RecordError(f"unknown type {kind!r}")
+            except (ValueError, AttributeError, RecordError) as exc:
+                self._error(state['line'], exc)
+                continue
+            chunk[kind].append((state['line'], record))
+        return chunk, count
+
+    def _error(self, line, exc):
+        if self.strict:
+            raise CommandError(f"line {line}: {exc}")
+        self.stderr.write(f"line {line}: {exc}")
+        self.errors += 1
+
+    def _flush(self, chunk):
+        imported = 0
+        touched = set()
+
+        # bulk_create(ignore_conflicts=True) возвращает и пропущенные строки — считаем только новые
+        users = {
+            r['username']: User(username=r['username'], email=r.get('email', ''), role=r.get('role', User.Roles.USER))
+            for _, r in chunk['user'] if r.get('username')
+        }
+        for username in User.objects.filter(username__in=list(users)).values_list('username', flat=True):
+            del users[username]
+        for user in users.values():
+            user.set_unusable_password()
+        User.objects.bulk_create(users.values(), batch_size=self.batch_size, ignore_conflicts=True)
+        imported += len(users)
+
+        categories = {
+            r['slug']: Category(name=r['name'], slug=r['slug']) for _, r in chunk['category'] if r.get('slug')
+        }
+        new_categories = [category for slug, category in categories.items() if slug not in self.categories]
+        if new_categories:
+            Category.objects.bulk_create(new_categories, batch_size=self.batch_size, ignore_conflicts=True)
+            self.categories = dict(Category.objects.values_list('slug', 'pk'))
+            imported += len(new_categories)
+
+        self._load_users(chunk)
+
+        articles, refs = [], []
+        for line, r in chunk['article']:
+            try:
+                articles.append(Article(
+                    author_id=self._user(r['author']),
+                    category_id=self.categories.get(r.get('category')),
+                    title=r['title'],
+                    content=r.get('content', ''),
+                    image=r.get('image', ''),
+                    is_published=bool(r.get('is_published', False)),
+                ))
+                refs.append(r.get('ref'))
+            except (KeyError, RecordError) as exc:
+                self._error(line, exc)
+        for article in articles:
+            article.render_content()  # bulk_create не вызывает save()
+        created = Article.objects.bulk_create(articles, batch_size=self.batch_size)
+        for ref, article in zip(refs, created):
+            if ref is not None:
+                self.refs[str(ref)] = article.pk
+        search.index_articles([a.pk for a in created])
+        # post_save не срабатывает — ставим сборку вариантов картинок сами
+        stale = [a.pk for a in created if images.variants_stale(a)]
+        jobs.enqueue_many(
+            'build_image_variants', [{'article_id': pk} for pk in stale], unique_keys=[f'images:{pk}' for pk in stale],
+        )
+        imported += len(created)
+
+        votes = self._interactions(chunk['vote'], LikeDislike, lambda r: {'value': 1 if r['value'] > 0 else -1})
+        LikeDislike.objects.bulk_create(
+            votes, batch_size=self.batch_size,
+            update_conflicts=True, unique_fields=['user', 'article'], update_fields=['value'],
+        )
+        ratings = self._interactions(chunk['rating'], Rating, lambda r: {'value': max(1, min(5, int(r['value'])))})
+        Rating.objects.bulk_create(
+            ratings, batch_size=self.batch_size,
+            update_conflicts=True, unique_fields=['user', 'article'], update_fields=['value'],
+        )
+        bookmarks = self._interactions(chunk['bookmark'], Bookmark, lambda r: {})
+        Bookmark.objects.bulk_create(bookmarks, batch_size=self.batch_size, ignore_conflicts=True)
+
+        imported += len(votes) + len(ratings) + len(bookmarks)
+        touched.update(obj.article_id for obj in votes + ratings)
+        return imported, touched
+
+    def _load_users(self, chunk):
+        wanted = {
+            r.get('author') if kind == 'article' else r.get('user')
+            for kind in ('article', 'vote', 'rating', 'bookmark')
+            for _, r in chunk[kind]
+        }
+        missing = {name for name in wanted if isinstance(name, str)} - set(self.users)
+        if missing:
+            self.users.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+
+    def _user(self, username):
+        if username not in self.users:
+            raise RecordError(f"unknown user {username!r}")
+        return self.users[username]
+
+    def _article(self, ref):
+        # int — pk существующей статьи, строка — ref статьи из этого же импорта
+        if isinstance(ref, int):
+            return ref
+        if str(ref) not in self.refs:
+            raise RecordError(f"unknown article ref {ref!r}")
+        return self.refs[str(ref)]
+
+    def _interactions(self, records, model, extra):
+        objects = {}
+        for line, r in records:
+            try:
+                user_id = self._user(r['user'])
+                article_id = self._article(r['article'])
+                # последняя запись для пары (user, article) побеждает — как при повторном голосе
+                objects[(user_id, article_id)] = (line, model(user_id=user_id, article_id=article_id, **extra(r)))
+            except (KeyError, TypeError, ValueError, RecordError) as exc:
+                self._error(line, exc)
+        existing = set(Article.objects.filter(pk__in={a for _, a in objects}).values_list('pk', flat=True))
+        valid = []
+        for (_, article_id), (line, obj) in objects.items():
+            if article_id in existing:
+                valid.append(obj)
+            else:
+                self._error(line, RecordError(f"unknown article {article_id!r}"))
+        return valid
+
+    def _save_checkpoint(self, path, state):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(state, fh)
+        os.replace(tmp, path)
+
+    def _finish(self, touched):
+        # bulk_create обходит инкрементальные счётчики — пересчитываем затронутые статьи
+        touched = sorted(touched)
+        if touched:
+            self.stdout.write(f"Rebuilding counters for {len(touched)} article(s)...")
+        for i in range(0, len(touched), FINISH_BATCH):
+            batch = touched[i:i + FINISH_BATCH]
+            refresh_article_stats(Article.objects.filter(pk__in=batch))
+            bump_scopes(*(article_scope(pk) for pk in batch))
+        # новые статьи и голоса меняют итоги авторов; импорт редкий, пересчитываем таблицу целиком
+        refresh_author_stats()
+        bump_scopes(FEEDS_SCOPE, *(category_scope(slug) for slug in self.categories))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from articles.services import refresh_author_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the AuthorStats table (published articles, likes, ratings, newest article date) from articles"
+
+    def handle(self, *args, **options):
+        written = refresh_author_stats()
+        self.stdout.write(self.style.SUCCESS(f"Author statistics rebuilt for {written} author(s)."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from articles import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the FTS5 article search index and refill it from articles_article"
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text index is only maintained on SQLite databases.")
+        total = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt: {total} article(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from articles.services import refresh_article_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild Article vote counters, rating average and popularity from LikeDislike and Rating rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total, drifted = refresh_article_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Vote counters checked for {total} article(s), {len(drifted)} corrected."
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from articles.services import refresh_article_stats
+
+
+class Command(BaseCommand):
+    help = "Compare stored rating aggregates and histograms with Rating rows and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Only report articles that drifted")
+
+    def handle(self, *args, **options):
+        total, drifted = refresh_article_stats(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for pk in drifted:
+            self.stdout.write(f"article {pk}: stored aggregates differ from Rating rows")
+        verb = "would be corrected" if options['dry_run'] else "corrected"
+        self.stdout.write(self.style.SUCCESS(f"{total} article(s) checked, {len(drifted)} {verb}."))
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from articles import jobs
+
+PURGE_EVERY = 60 * 10
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the articles Job table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help="Worker threads per process")
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when idle")
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        if options['processes'] > 1:
+            # соединения родителя не должны достаться дочерним процессам
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            children = [
+                context.Process(target=self._run_process, args=(options,), daemon=False)
+                for _ in range(options['processes'])
+            ]
+            for child in children:
+                child.start()
+            for child in children:
+                child.join()
+        else:
+            self._run_process(options)
+
+    def _run_process(self, options):
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *args: stop.set())
+
+        jobs.requeue_stale()
+        worker_ids = [f'{socket.gethostname()}:{os.getpid()}:{i}' for i in range(options['threads'])]
+        if len(worker_ids) == 1:
+            self._loop(worker_ids[0], options, stop)
+            return
+        threads = [threading.Thread(target=self._loop, args=(worker_id, options, stop)) for worker_id in worker_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _loop(self, worker_id, options, stop):
+        last_purge = time.monotonic()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                claimed = jobs.claim(worker_id)
+                for job in claimed:
+                    ok = jobs.run_job(job)
+                    self.stdout.write(f"[{worker_id}] {job.name} #{job.pk}: {'done' if ok else 'failed'}")
+                if not claimed:
+                    if options['burst']:
+                        break
+                    stop.wait(options['poll_interval'])
+                if time.monotonic() - last_purge > PURGE_EVERY:
+                    jobs.requeue_stale()
+                    jobs.purge_finished()
+                    last_purge = time.monotonic()
+        finally:
+            connections.close_all()
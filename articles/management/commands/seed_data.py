@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from articles.seed import SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic users, articles, votes, ratings and bookmarks with Zipf-like skew"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--articles', type=int, default=500)
+        parser.add_argument('--votes', type=int, default=5000)
+        parser.add_argument('--ratings', type=int, default=2000)
+        parser.add_argument('--bookmarks', type=int, default=1000)
+        parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent; 0 is uniform")
+        parser.add_argument('--published-ratio', type=float, default=0.9)
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        counts = seed(
+            users=options['users'], articles=options['articles'], votes=options['votes'],
+            ratings=options['ratings'], bookmarks=options['bookmarks'], skew=options['skew'],
+            published_ratio=options['published_ratio'], random_seed=options['random_seed'],
+            stdout=self.stdout,
+        )
+        summary = ', '.join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary}. Seed users log in with password {SEED_PASSWORD!r}."
+        ))
@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the replica file with the online backup API "
+        "(local stand-in for real replication)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--primary', default='default')
+        parser.add_argument('--replica', default='replica')
+
+    def handle(self, *args, **options):
+        names = {}
+        for role in ('primary', 'replica'):
+            alias = options[role]
+            if alias not in connections.settings:
+                raise CommandError(f"No database alias {alias!r}; set HABR_REPLICA_DB for the replica.")
+            db = connections.settings[alias]
+            if db['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f"{alias!r} is not an SQLite database.")
+            names[role] = str(db['NAME'])
+
+        # открытое соединение реплики держит старый снимок — закрываем до копирования
+        connections[options['replica']].close()
+        source = sqlite3.connect(names['primary'])
+        target = sqlite3.connect(names['replica'])
+        try:
+            with target:
+                source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f"Replica {names['replica']} synced from {names['primary']}."))
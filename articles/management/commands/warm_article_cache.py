@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from articles.cache import cache_is_shared, warm_fragments
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = "Pre-render cached article card and detail fragments (run after deploy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Only warm the N most recent articles")
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            raise CommandError(
+                "The default cache is per-process local memory: fragments warmed here would not reach "
+                "the web workers. Set HABR_CACHE_DIR (or another shared backend) first."
+            )
+        articles = Article.objects.order_by('-created_at', '-id')
+        if options['limit']:
+            articles = Article.objects.filter(
+                pk__in=list(articles.filter(is_published=True).values_list('pk', flat=True)[:options['limit']])
+            )
+        total = warm_fragments(articles, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Warmed fragment cache for {total} article(s)."))
@@ -0,0 +1,49 @@
+"""
+Markdown rendering of Article.content.
+
+Articles are rendered once, when they are saved (Article.render_content), and
+the sanitized HTML and a plain-text excerpt are stored next to the source, so
+feeds and the detail page never run Markdown or the sanitizer on a read.
+"""
+import html
+import re
+
+import bleach
+import markdown
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 280
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists', 'nl2br']
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'del', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'strong', 'sub', 'sup',
+    'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': ['href', 'title'],
+    'abbr': ['title'],
+    'img': ['src', 'alt', 'title'],
+    'td': ['align'],
+    'th': ['align'],
+    'code': ['class'],  # language-xxx из fenced_code
+}
+ALLOWED_PROTOCOLS = {'http', 'https', 'mailto'}
+
+
+def render_html(text):
+    """Markdown -> HTML safe to output with |safe (scripts, handlers and javascript: links removed)."""
+    # Markdown-объект хранит состояние между вызовами, поэтому новый на каждый рендер
+    raw = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, output_format='html').convert(text or '')
+    return bleach.clean(
+        raw, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, protocols=ALLOWED_PROTOCOLS, strip=True,
+    )
+
+
+def make_excerpt(content_html, length=EXCERPT_LENGTH):
+    """Plain-text beginning of rendered HTML, cut on a word boundary."""
+    text = html.unescape(strip_tags(content_html))
+    text = re.sub(r'\s+', ' ', text).strip()
+    return Truncator(text).chars(length)
@@ -0,0 +1,216 @@
+"""
+Process-local metrics with a file-backed multi-process view.
+
+Every worker aggregates counters and histograms in memory. When
+settings.METRICS_DIR is set (HABR_METRICS_DIR), each process also dumps its
+totals to <METRICS_DIR>/<pid>.json at most once per FLUSH_INTERVAL and at
+exit; render() sums all files, so whichever worker answers /metrics reports
+the whole pool — the same model as prometheus_client's multiprocess mode.
+Files of exited workers are kept on purpose: counters must not go backwards.
+Clear the directory when the pool restarts.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+FLUSH_INTERVAL = 1.0
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# имя -> (тип, справка); labels у каждой серии свои
+METRICS = {
+    'habr_http_requests_total': ('counter', "HTTP requests by URL name, method and status class"),
+    'habr_http_request_duration_seconds': ('histogram', "Request latency by URL name"),
+    'habr_db_queries_total': ('counter', "SQL queries executed by URL name"),
+    'habr_db_query_duration_seconds_total': ('counter', "Time spent in SQL by URL name"),
+    'habr_cache_requests_total': ('counter', "Cache lookups by key kind and result"),
+    'habr_interaction_writes_total': ('counter', "Committed vote, rating and bookmark writes"),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+_last_flush = 0.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += amount
+    _maybe_flush()
+
+
+def observe(name, value, **labels):
+    with _lock:
+        key = _key(name, labels)
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * len(LATENCY_BUCKETS) + [0, 0.0]  # бакеты, count, sum
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += value
+    _maybe_flush()
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'counters': [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, list(labels), hist[:]] for (name, labels), hist in _histograms.items()],
+        }
+
+
+def flush():
+    global _last_flush
+    directory = metrics_dir()
+    _last_flush = time.monotonic()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(_snapshot(), fh)
+    os.replace(tmp, path)
+
+
+def _maybe_flush():
+    if metrics_dir() and time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+atexit.register(lambda: metrics_dir() and flush())
+
+
+def reset():
+    """Forget this process's metrics (tests)."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+    directory = metrics_dir()
+    if directory:
+        for path in glob.glob(os.path.join(directory, f'{os.getpid()}.json')):
+            os.remove(path)
+
+
+def collect():
+    """Totals across all worker processes: ({key: value}, {key: hist})."""
+    directory = metrics_dir()
+    if not directory:
+        snapshots = [_snapshot()]
+    else:
+        flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue  # файл другого процесса пишется прямо сейчас — возьмём в следующий раз
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, hist in snapshot['histograms']:
+            key = name, tuple(map(tuple, labels))
+            total = histograms.setdefault(key, [0] * len(hist))
+            for i, value in enumerate(hist):
+                total[i] += value
+    return counters, histograms
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    )
+    return '{' + body + '}'
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render():
+    """Prometheus text exposition format 0.0.4."""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        else:
+            for (metric, labels), hist in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, hist):
+                    lines.append(f'{name}_bucket{_labels(labels, [("le", repr(bound))])} {count}')
+                lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {hist[-2]}')
+                lines.append(f'{name}_count{_labels(labels)} {hist[-2]}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(hist[-1])}')
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Count and time every request under its URL name (resolver_match.view_name),
+    so views in any app are covered without per-view code. Unresolved paths
+    are grouped under a single label to keep the series count bounded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        inc('habr_http_requests_total', view=view, method=request.method, status=f'{response.status_code // 100}xx')
+        observe('habr_http_request_duration_seconds', elapsed, view=view)
+        inc('habr_db_queries_total', timer.count, view=view)
+        inc('habr_db_query_duration_seconds_total', timer.duration, view=view)
+        return response
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:03
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_vote_counters(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    articles = Article.objects.annotate(
+        n_likes=Count('votes', filter=Q(votes__value=1)),
+        n_dislikes=Count('votes', filter=Q(votes__value=-1)),
+    )
+    for article in articles.iterator():
+        total = article.n_likes + article.n_dislikes
+        article.likes_count = article.n_likes
+        article.dislikes_count = article.n_dislikes
+        article.rating_percent = round((article.n_likes / total) * 100, 1) if total > 0 else 0
+        article.save(update_fields=['likes_count', 'dislikes_count', 'rating_percent'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_percent',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(fill_vote_counters, migrations.RunPython.noop),
+    ]
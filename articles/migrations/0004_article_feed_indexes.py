@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_article_vote_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['is_published', '-created_at', '-id'], name='article_feed_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['category', 'is_published', '-created_at', '-id'], name='article_feed_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['is_published', '-rating_percent', '-rating', '-created_at', '-id'], name='article_feed_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='article_feed_author_idx'),
+        ),
+    ]
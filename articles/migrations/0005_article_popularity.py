@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:05
+
+import math
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# формула заморожена здесь, а не импортируется из articles.ranking: правки модуля
+# не должны менять уже применённую миграцию
+Z = 1.96
+
+
+def wilson_lower_bound(positive, total, z=Z):
+    if total <= 0:
+        return 0.0
+    phat = positive / total
+    z2 = z * z
+    centre = phat + z2 / (2 * total)
+    margin = z * math.sqrt((phat * (1 - phat) + z2 / (4 * total)) / total)
+    return (centre - margin) / (1 + z2 / total)
+
+
+def popularity_score(likes, dislikes, rating_avg=0.0, rating_count=0):
+    votes = likes + dislikes
+    evidence = votes + rating_count
+    if evidence == 0:
+        return 0.0
+    score = votes * wilson_lower_bound(likes, votes)
+    if rating_count:
+        positive = rating_count * (max(1.0, min(5.0, rating_avg)) - 1) / 4
+        score += rating_count * wilson_lower_bound(positive, rating_count)
+    return round(score / evidence, 6)
+
+
+def fill_popularity(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    for article in Article.objects.annotate(n_ratings=Count('ratings')).iterator():
+        article.popularity = popularity_score(
+            article.likes_count, article.dislikes_count, article.rating, article.n_ratings
+        )
+        article.save(update_fields=['popularity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0004_article_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='article',
+            name='article_feed_popular_idx',
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='popularity',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(fill_popularity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['is_published', '-popularity', '-created_at', '-id'], name='article_feed_popularity_idx'),
+        ),
+    ]
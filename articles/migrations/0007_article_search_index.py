@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:20
+
+from django.db import migrations
+
+# SQL заморожен здесь, а не импортируется из articles.search: правки модуля
+# не должны менять уже применённую миграцию
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_article_fts
+    USING fts5(title, content, author, category, tokenize = 'unicode61 remove_diacritics 2')
+    """,
+    """
+    INSERT INTO articles_article_fts(rowid, title, content, author, category)
+    SELECT a.id, a.title, a.content,
+           COALESCE((SELECT username FROM users_user WHERE id = a.author_id), ''),
+           COALESCE((SELECT name FROM articles_category WHERE id = a.category_id), '')
+    FROM articles_article a
+    """,
+]
+
+DROP_SQL = [
+    "DROP TABLE IF EXISTS articles_article_fts",
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0006_article_version'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    Rating = apps.get_model('articles', 'Rating')
+    buckets = {}
+    for article_id, value, n in (
+        Rating.objects.order_by().values_list('article_id', 'value').annotate(n=Count('id'))
+    ):
+        buckets.setdefault(article_id, {})[value] = n
+    for article_id, histogram in buckets.items():
+        fields = {f'rating_{value}_count': histogram.get(value, 0) for value in range(1, 6)}
+        fields['rating_count'] = sum(histogram.values())
+        fields['rating_sum'] = sum(value * n for value, n in histogram.items())
+        Article.objects.filter(pk=article_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0007_article_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
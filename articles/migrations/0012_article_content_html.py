@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:05
+
+import html
+import re
+
+import bleach
+import markdown
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# рендер заморожен здесь, а не импортируется из articles.markup: правки модуля
+# не должны менять уже применённую миграцию
+EXCERPT_LENGTH = 280
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists', 'nl2br']
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'del', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'strong', 'sub', 'sup',
+    'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': ['href', 'title'],
+    'abbr': ['title'],
+    'img': ['src', 'alt', 'title'],
+    'td': ['align'],
+    'th': ['align'],
+    'code': ['class'],
+}
+ALLOWED_PROTOCOLS = {'http', 'https', 'mailto'}
+
+
+def render_html(text):
+    raw = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, output_format='html').convert(text or '')
+    return bleach.clean(
+        raw, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, protocols=ALLOWED_PROTOCOLS, strip=True,
+    )
+
+
+def make_excerpt(content_html, length=EXCERPT_LENGTH):
+    text = html.unescape(strip_tags(content_html))
+    text = re.sub(r'\s+', ' ', text).strip()
+    return Truncator(text).chars(length)
+
+
+def render_existing(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    batch = []
+    for article in Article.objects.only('id', 'content').iterator(chunk_size=500):
+        article.content_html = render_html(article.content)
+        article.excerpt = make_excerpt(article.content_html)
+        batch.append(article)
+        if len(batch) == 500:
+            Article.objects.bulk_update(batch, ['content_html', 'excerpt'])
+            batch = []
+    Article.objects.bulk_update(batch, ['content_html', 'excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0011_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
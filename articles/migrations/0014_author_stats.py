@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+import django.db.models.deletion
+
+
+def fill_author_stats(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    AuthorStats = apps.get_model('articles', 'AuthorStats')
+    rows = (
+        Article.objects.filter(is_published=True).order_by().values('author_id')
+        .annotate(n=Count('id'), likes=Sum('likes_count'), rsum=Sum('rating_sum'),
+                  rcount=Sum('rating_count'), latest=Max('created_at'))
+    )
+    AuthorStats.objects.bulk_create([
+        AuthorStats(author_id=r['author_id'], published_count=r['n'], total_likes=r['likes'],
+                    rating_sum=r['rsum'], rating_count=r['rcount'], latest_published_at=r['latest'])
+        for r in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('articles', '0013_related_articles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('published_count', models.PositiveIntegerField(default=0)),
+                ('total_likes', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('latest_published_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-published_count', '-author'], name='author_stats_feed_idx')],
+            },
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
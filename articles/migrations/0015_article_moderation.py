@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0014_author_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='is_rejected',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_published', False), ('is_rejected', False)), fields=['id'], name='article_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_published', False), ('is_rejected', False)), fields=['category', 'id'], name='article_pending_category_idx'),
+        ),
+    ]
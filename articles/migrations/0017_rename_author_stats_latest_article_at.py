@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0016_article_updated_index'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='authorstats',
+            old_name='latest_published_at',
+            new_name='latest_article_at',
+        ),
+    ]
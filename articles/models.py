@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from . import markup
 
 
 class Category(models.Model):
@@ -10,6 +13,19 @@ class Category(models.Model):
         return self.name
 
 
+PENDING_MODERATION = models.Q(is_published=False, is_rejected=False)
+
+
+class ArticleQuerySet(models.QuerySet):
+    def for_list(self):
+        """Feed rows: author and category joined, article bodies left in the database."""
+        return self.select_related('author', 'category').defer(*Article.LIST_DEFERRED_FIELDS)
+
+    def pending(self):
+        """Submissions waiting for a moderator; matches the partial indexes."""
+        return self.filter(PENDING_MODERATION)
+
+
 class Article(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -18,7 +34,12 @@ class Article(models.Model):
     )
     title = models.CharField(max_length=200)
     content = models.TextField()
+    # Markdown из content, отрендеренный при сохранении (articles/markup.py)
+    content_html = models.TextField(blank=True, editable=False)
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)
     image = models.ImageField(upload_to='articles/')  # Cloudinary подключен
+    # уменьшенные копии image: {'source': image.name, 'widths': {'320': url, ...}}, см. articles/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(
         Category,
         on_delete=models.SET_NULL,
@@ -28,11 +49,90 @@ class Article(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=False)  # модерация
+    is_rejected = models.BooleanField(default=False)  # отклонена модератором, в очереди не показывается
     rating = models.FloatField(default=0.0)
+    # агрегаты оценок 1..5 и гистограмма, обновляются инкрементально в rate_article
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    # денормализованные счётчики голосов, см. articles/services.py
+    likes_count = models.PositiveIntegerField(default=0)
+    dislikes_count = models.PositiveIntegerField(default=0)
+    rating_percent = models.FloatField(default=0.0)
+    # доверительный рейтинг для feed_popular, см. articles/ranking.py
+    popularity = models.FloatField(default=0.0)
+    # версия для ключей фрагментного кэша карточек; растёт при любом изменении статьи, голосах и оценках
+    version = models.PositiveIntegerField(default=1)
+
+    objects = ArticleQuerySet.as_manager()
+
+    class Meta:
+        # покрывают сортировки keyset-пагинации лент (articles/pagination.py)
+        indexes = [
+            models.Index(fields=['is_published', '-created_at', '-id'], name='article_feed_latest_idx'),
+            models.Index(fields=['category', 'is_published', '-created_at', '-id'], name='article_feed_category_idx'),
+            models.Index(
+                fields=['is_published', '-popularity', '-created_at', '-id'],
+                name='article_feed_popularity_idx',
+            ),
+            models.Index(fields=['author', '-created_at', '-id'], name='article_feed_author_idx'),
+            # частичные: в индекс попадают только статьи, ждущие модерации (articles/moderation.py)
+            models.Index(fields=['id'], condition=PENDING_MODERATION, name='article_pending_idx'),
+            models.Index(fields=['category', 'id'], condition=PENDING_MODERATION, name='article_pending_category_idx'),
+            # инкрементальная выгрузка идёт по (updated_at, id), см. articles/export.py
+            models.Index(fields=['updated_at', 'id'], name='article_updated_idx'),
+        ]
+
+    HISTOGRAM_FIELDS = [f'rating_{value}_count' for value in range(1, 6)]
+    RENDERED_FIELDS = ('content_html', 'excerpt')
+    # лентам хватает excerpt
+    LIST_DEFERRED_FIELDS = ('content', 'content_html')
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # категория на момент загрузки: при переносе статьи сбрасываем и старую ленту категории
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+    @staticmethod
+    def histogram_field(value):
+        return f'rating_{value}_count'
+
+    @property
+    def rating_histogram(self):
+        """[(value, count, percent)] from 5 down to 1, read from the stored buckets."""
+        rows = []
+        for value in range(5, 0, -1):
+            count = getattr(self, self.histogram_field(value))
+            percent = round(count * 100 / self.rating_count) if self.rating_count else 0
+            rows.append((value, count, percent))
+        return rows
+
+    def render_content(self):
+        """Fill content_html and excerpt from content (also call before bulk_create)."""
+        self.content_html = markup.render_html(self.content)
+        self.excerpt = markup.make_excerpt(self.content_html)
+
+    def save(self, *args, **kwargs):
+        self.version = (self.version or 0) + 1
+        update_fields = kwargs.get('update_fields')
+        rerender = 'content' not in self.get_deferred_fields() and (
+            update_fields is None or 'content' in update_fields
+        )
+        if rerender:
+            self.render_content()
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', *(self.RENDERED_FIELDS if rerender else ())}
+        super().save(*args, **kwargs)
+
 
 class Rating(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -58,3 +158,82 @@ class Bookmark(models.Model):
 
     class Meta:
         unique_together = ('user', 'article')
+
+
+class AuthorStats(models.Model):
+    """
+    Per-author totals over published articles for feed_authors and author
+    pages; maintained by articles/services.py, rebuilt by rebuild_author_stats.
+    """
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='author_stats',
+    )
+    published_count = models.PositiveIntegerField(default=0)
+    total_likes = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # created_at самой новой опубликованной статьи; времени публикации статьи не хранят
+    latest_article_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-published_count', '-author'], name='author_stats_feed_idx'),
+        ]
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else 0.0
+
+
+class RelatedArticle(models.Model):
+    """Precomputed top-K neighbours of an article, see articles/related.py."""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        # уникальный индекс (article, rank) отдаёт соседей статьи одним range scan
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'rank'], name='related_article_rank_uniq'),
+        ]
+
+
+class RelatedIndexState(models.Model):
+    """Signature of the inputs RelatedArticle rows were last built from; a mismatch marks the article stale."""
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    signature = models.CharField(max_length=64)
+    built_at = models.DateTimeField(auto_now=True)
+
+
+class Job(models.Model):
+    """Background work item, see articles/jobs.py."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # непустой ключ — не ставить второй такой же job, пока первый ждёт в очереди
+    unique_key = models.CharField(max_length=200, blank=True, default='')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_pending_idx'),
+            models.Index(fields=['unique_key', 'status'], name='job_unique_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
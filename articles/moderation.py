@@ -0,0 +1,71 @@
+"""
+Moderation queue: pending submissions, bulk decisions and per-category counts.
+
+Pending articles (Article.objects.pending()) are served by two partial
+indexes that only hold unmoderated rows, so listing, filtering and counting
+the queue stays cheap however many articles are already published. A
+decision on any number of articles is a single UPDATE; caches are
+invalidated precisely: approving drops the feeds and categories the articles
+join, rejecting only their own detail pages.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .cache import article_scope, bump_scopes, enqueue_warm, invalidate_articles
+from .models import Article, Category
+from .services import refresh_author_stats
+
+PENDING_COUNTS_KEY = 'moderation:pending-counts'
+PENDING_COUNTS_TIMEOUT = 5 * 60
+MAX_BULK = 500
+
+
+def pending_counts():
+    """{category_id: pending count} (None for articles without a category), cached."""
+    counts = cache.get(PENDING_COUNTS_KEY)
+    if counts is None:
+        counts = dict(
+            Article.objects.pending().order_by().values_list('category_id').annotate(n=Count('id'))
+        )
+        cache.set(PENDING_COUNTS_KEY, counts, PENDING_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_pending_counts():
+    cache.delete(PENDING_COUNTS_KEY)
+
+
+def category_counts():
+    """[(category, pending count)] for the queue sidebar, categories without submissions skipped."""
+    counts = pending_counts()
+    return [(c, counts[c.pk]) for c in Category.objects.filter(pk__in=counts).order_by('name')]
+
+
+def moderate(article_ids, approve):
+    """
+    Approve (publish) or reject the pending articles among article_ids with
+    one UPDATE. Articles already moderated are left alone. Returns how many
+    changed.
+    """
+    article_ids = list(article_ids)[:MAX_BULK]
+    with transaction.atomic():
+        affected = list(
+            Article.objects.pending().filter(pk__in=article_ids).select_for_update()
+            .only('id', 'author_id', 'category_id')
+        )
+        if not affected:
+            return 0
+        updated = Article.objects.pending().filter(pk__in=[a.pk for a in affected]).update(
+            is_published=approve, is_rejected=not approve, version=F('version') + 1, updated_at=timezone.now(),
+        )
+        if approve:
+            refresh_author_stats({a.author_id for a in affected})
+            transaction.on_commit(lambda: invalidate_articles(affected))
+            enqueue_warm(a.pk for a in affected)
+        else:
+            # отклонённые статьи не были в лентах — только их страницы
+            transaction.on_commit(lambda: bump_scopes(*(article_scope(a.pk) for a in affected)))
+        transaction.on_commit(invalidate_pending_counts)
+    return updated
@@ -0,0 +1,72 @@
+"""
+Per-user interaction overlay for feed cards and the detail page.
+
+Cards are fragment-cached per (pk, version) and shared by every visitor, so
+what the current user did to an article (vote, bookmark, rating) cannot live
+inside them. Instead the page fetches the user's interactions with all of its
+articles in one UNION ALL query over the (user, article) unique indexes and
+templates render the result next to the cached card.
+"""
+from dataclasses import dataclass
+
+from django.db.models import F, IntegerField, Value
+
+from .models import Bookmark, LikeDislike, Rating
+
+VOTE, BOOKMARK, RATING = 1, 2, 3
+
+
+@dataclass
+class Interaction:
+    vote: int = 0  # 1 — лайк, -1 — дизлайк
+    bookmarked: bool = False
+    rating: int = None
+
+    @property
+    def liked(self):
+        return self.vote == 1
+
+    @property
+    def disliked(self):
+        return self.vote == -1
+
+
+def _rows(model, kind, value, user, article_ids):
+    # kind и val — аннотации в одном порядке во всех ветках, иначе столбцы UNION разъедутся
+    return (
+        model.objects.filter(user=user, article_id__in=article_ids).order_by()
+        .annotate(kind=Value(kind, output_field=IntegerField()), val=value)
+        .values_list('article_id', 'kind', 'val')
+    )
+
+
+def interactions_for(user, article_ids):
+    """{article_id: Interaction} for the articles the user voted on, bookmarked or rated."""
+    article_ids = list(article_ids)
+    if not article_ids or not user.is_authenticated:
+        return {}
+    rows = _rows(LikeDislike, VOTE, F('value'), user, article_ids).union(
+        _rows(Bookmark, BOOKMARK, Value(1, output_field=IntegerField()), user, article_ids),
+        _rows(Rating, RATING, F('value'), user, article_ids),
+        all=True,
+    )
+    result = {}
+    for article_id, kind, value in rows:
+        interaction = result.setdefault(article_id, Interaction())
+        if kind == VOTE:
+            interaction.vote = value
+        elif kind == BOOKMARK:
+            interaction.bookmarked = True
+        else:
+            interaction.rating = value
+    return result
+
+
+def annotate(user, articles):
+    """Set .interaction on the articles the user touched; anonymous users cost no query."""
+    articles = list(articles)
+    overlay = interactions_for(user, [a.pk for a in articles])
+    for article in articles:
+        if article.pk in overlay:
+            article.interaction = overlay[article.pk]
+    return overlay
@@ -0,0 +1,131 @@
+import base64
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 20
+
+# порядок сортировки лент (все поля по убыванию), id — последний тай-брейкер
+LATEST_ORDERING = ('created_at', 'id')
+POPULAR_ORDERING = ('popularity', 'created_at', 'id')
+AUTHOR_ORDERING = ('published_count', 'author_id')
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str = None
+    cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    """Returns the cursor values converted to python types, or None if the cursor is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(ordering):
+            return None
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(ordering, raw)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _after(ordering, values):
+    # (a < a0) OR (a = a0 AND b < b0) OR ... — строки строго после курсора при сортировке DESC
+    condition = Q()
+    for i, name in enumerate(ordering):
+        step = Q(**{f'{name}__lt': values[i]})
+        for prev_name, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_name: prev_value})
+        condition |= step
+    return condition
+
+
+def _value(row, name):
+    # строки могут быть моделями или словарями из .values()
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def _page_queryset(queryset, cursor, ordering, per_page):
+    values = decode_cursor(cursor, queryset.model, ordering) if cursor else None
+    queryset = queryset.order_by(*[f'-{name}' for name in ordering])
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+    return queryset[:per_page + 1], (cursor if values is not None else None)
+
+
+def _make_page(rows, cursor, ordering, per_page):
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([_value(rows[-1], name) for name in ordering])
+    return KeysetPage(rows, next_cursor, cursor)
+
+
+def paginate_keyset(queryset, cursor=None, ordering=LATEST_ORDERING, per_page=PAGE_SIZE):
+    """
+    Cursor pagination over a descending ordering.
+
+    The cursor holds the ordering values of the last row of the previous page,
+    so every page is a single indexed range scan no matter how deep it is.
+    """
+    page_queryset, cursor = _page_queryset(queryset, cursor, ordering, per_page)
+    return _make_page(list(page_queryset), cursor, ordering, per_page)
+
+
+async def apaginate_keyset(queryset, cursor=None, ordering=LATEST_ORDERING, per_page=PAGE_SIZE):
+    """paginate_keyset for async views, fetching rows through the async ORM."""
+    page_queryset, cursor = _page_queryset(queryset, cursor, ordering, per_page)
+    return _make_page([row async for row in page_queryset], cursor, ordering, per_page)
+
+
+def paginate_ids(queryset, ids, cursor=None, per_page=PAGE_SIZE):
+    """
+    Page through a precomputed ranking of primary keys (e.g. recommendations).
+
+    The cursor is the offset into ids; rows missing from queryset (deleted or
+    unpublished since the ranking was built) are skipped.
+    """
+    try:
+        offset = max(0, int(cursor))
+    except (TypeError, ValueError):
+        offset = 0
+    chunk = ids[offset:offset + per_page]
+    by_id = queryset.in_bulk(chunk)
+    rows = [by_id[pk] for pk in chunk if pk in by_id]
+    next_cursor = str(offset + per_page) if offset + per_page < len(ids) else None
+    return KeysetPage(rows, next_cursor, str(offset) if offset else None)
+
+
+def paginate_by_pk(queryset, cursor=None, per_page=PAGE_SIZE):
+    """Oldest-first pages for work queues; the cursor is the last primary key of the previous page."""
+    try:
+        after = int(cursor)
+    except (TypeError, ValueError):
+        after = None
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    rows = list(queryset.order_by('pk')[:per_page + 1])
+    next_cursor = str(rows[per_page - 1].pk) if len(rows) > per_page else None
+    return KeysetPage(rows[:per_page], next_cursor, cursor if after is not None else None)
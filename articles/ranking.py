@@ -0,0 +1,35 @@
+import math
+
+# z для 95% доверительного интервала
+Z = 1.96
+
+
+def wilson_lower_bound(positive, total, z=Z):
+    """Lower bound of the Wilson score interval for a Bernoulli proportion."""
+    if total <= 0:
+        return 0.0
+    phat = positive / total
+    z2 = z * z
+    centre = phat + z2 / (2 * total)
+    margin = z * math.sqrt((phat * (1 - phat) + z2 / (4 * total)) / total)
+    return (centre - margin) / (1 + z2 / total)
+
+
+def popularity_score(likes, dislikes, rating_avg=0.0, rating_count=0):
+    """
+    Confidence-adjusted popularity used to order feed_popular.
+
+    Likes/dislikes and 1-5 ratings each get a Wilson lower bound (a rating of
+    r counts as (r - 1) / 4 of a positive vote); the two are blended in
+    proportion to how many votes and ratings back them. A few enthusiastic
+    votes therefore rank below a long, mostly positive track record.
+    """
+    votes = likes + dislikes
+    evidence = votes + rating_count
+    if evidence == 0:
+        return 0.0
+    score = votes * wilson_lower_bound(likes, votes)
+    if rating_count:
+        positive = rating_count * (max(1.0, min(5.0, rating_avg)) - 1) / 4
+        score += rating_count * wilson_lower_bound(positive, rating_count)
+    return round(score / evidence, 6)
@@ -0,0 +1,155 @@
+"""
+Personalized "For You" feed.
+
+A user's likes, dislikes, ratings and bookmarks are folded into two affinity
+matrices — users × categories and users × authors — built with NumPy for a
+whole batch of users at once. Candidate articles (the CANDIDATES most popular
+published ones) are then scored for the batch as a single matrix expression:
+
+    score = CATEGORY_WEIGHT * affinity[category] + AUTHOR_WEIGHT * affinity[author]
+            + POPULARITY_WEIGHT * popularity
+
+Articles the user already interacted with or wrote are excluded, and the top
+TOP_N ids per user are cached for CACHE_TTL. An empty list means the user has
+no usable history (cold start); the view then falls back to feed_popular.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from .models import Article, Bookmark, LikeDislike, Rating
+
+CANDIDATES = 2000
+TOP_N = 200
+CACHE_TTL = 30 * 60
+USER_BATCH = 500
+
+CATEGORY_WEIGHT = 0.7
+AUTHOR_WEIGHT = 1.0
+POPULARITY_WEIGHT = 0.3
+BOOKMARK_WEIGHT = 1.5
+
+
+def cache_key(user_id):
+    return f'recommendations:{user_id}'
+
+
+def _interactions(user_ids):
+    """(user_id, article_id, category_id, author_id, weight) rows for the given users."""
+    fields = ('user_id', 'article_id', 'article__category_id', 'article__author_id')
+    rows = []
+    for *key, value in LikeDislike.objects.filter(user_id__in=user_ids).values_list(*fields, 'value'):
+        rows.append((*key, float(value)))
+    # 1..5 -> -1..1: тройка нейтральна
+    for *key, value in Rating.objects.filter(user_id__in=user_ids).values_list(*fields, 'value'):
+        rows.append((*key, (value - 3) / 2))
+    for key in Bookmark.objects.filter(user_id__in=user_ids).values_list(*fields):
+        rows.append((*key, BOOKMARK_WEIGHT))
+    return rows
+
+
+def _candidates():
+    rows = list(
+        Article.objects.filter(is_published=True)
+        .order_by('-popularity', '-created_at', '-id')
+        .values_list('id', 'category_id', 'author_id', 'popularity')[:CANDIDATES]
+    )
+    if not rows:
+        return None
+    ids, categories, authors, popularity = zip(*rows)
+    return (
+        np.array(ids, dtype=np.int64),
+        np.array([c or 0 for c in categories], dtype=np.int64),  # 0 — «без категории»
+        np.array(authors, dtype=np.int64),
+        np.array(popularity, dtype=np.float64),
+    )
+
+
+def _index(values, universe):
+    """Positions of values in the sorted array universe; len(universe) for values not in it."""
+    positions = np.searchsorted(universe, values).clip(max=len(universe) - 1)
+    return np.where(universe[positions] == values, positions, len(universe))
+
+
+def _affinity(user_pos, keys, weights, n_users, universe):
+    """users × (universe + 1) matrix of summed weights, each row scaled to [-1, 1]."""
+    matrix = np.zeros((n_users, len(universe) + 1))
+    np.add.at(matrix, (user_pos, _index(keys, universe)), weights)
+    matrix[:, -1] = 0  # ключи вне кандидатов ни на что не влияют
+    scale = np.abs(matrix).max(axis=1, keepdims=True)
+    return np.divide(matrix, scale, out=np.zeros_like(matrix), where=scale > 0)
+
+
+def score_users(user_ids, top_n=TOP_N):
+    """{user_id: [article ids, best first]} for a batch of users; [] for cold-start users."""
+    user_ids = list(user_ids)
+    result = {user_id: [] for user_id in user_ids}
+    candidates = _candidates()
+    rows = _interactions(user_ids)
+    if candidates is None or not rows:
+        return result
+    cand_ids, cand_categories, cand_authors, cand_popularity = candidates
+
+    users = np.array(user_ids, dtype=np.int64)
+    order = np.argsort(users)
+    interaction_users, article_ids, categories, authors, weights = zip(*rows)
+    user_pos = order[np.searchsorted(users[order], np.array(interaction_users, dtype=np.int64))]
+    categories = np.array([c or 0 for c in categories], dtype=np.int64)
+    authors = np.array(authors, dtype=np.int64)
+    weights = np.array(weights, dtype=np.float64)
+
+    category_universe = np.unique(cand_categories)
+    author_universe = np.unique(cand_authors)
+    category_affinity = _affinity(user_pos, categories, weights, len(users), category_universe)
+    author_affinity = _affinity(user_pos, authors, weights, len(users), author_universe)
+
+    peak = cand_popularity.max()
+    popularity = cand_popularity / peak if peak > 0 else np.zeros_like(cand_popularity)
+    scores = (
+        CATEGORY_WEIGHT * category_affinity[:, _index(cand_categories, category_universe)]
+        + AUTHOR_WEIGHT * author_affinity[:, _index(cand_authors, author_universe)]
+        + POPULARITY_WEIGHT * popularity
+    )
+
+    # уже прочитанное и свои статьи не рекомендуем
+    sorted_ids = np.argsort(cand_ids)
+    article_ids = np.array(article_ids, dtype=np.int64)
+    seen = _index(article_ids, cand_ids[sorted_ids])
+    known = seen < len(cand_ids)
+    scores[user_pos[known], sorted_ids[seen[known]]] = -np.inf
+    scores[cand_authors[None, :] == users[:, None]] = -np.inf
+
+    has_history = np.zeros(len(users), dtype=bool)
+    has_history[user_pos] = True
+    top_n = min(top_n, len(cand_ids))
+    top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    for row in np.flatnonzero(has_history):
+        best = top[row][np.argsort(-scores[row, top[row]], kind='stable')]
+        best = best[np.isfinite(scores[row, best])]
+        result[user_ids[row]] = cand_ids[best].tolist()
+    return result
+
+
+def refresh(user_ids, batch_size=USER_BATCH):
+    """Recompute and cache recommendations for user_ids in batches; returns how many users were scored."""
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), batch_size):
+        batch = score_users(user_ids[start:start + batch_size])
+        cache.set_many({cache_key(user_id): ids for user_id, ids in batch.items()}, CACHE_TTL)
+    return len(user_ids)
+
+
+def active_user_ids():
+    """Users with any vote, rating or bookmark."""
+    ids = set()
+    for model in (LikeDislike, Rating, Bookmark):
+        ids.update(model.objects.order_by().values_list('user_id', flat=True).distinct())
+    return sorted(ids)
+
+
+def for_user(user):
+    """Cached top-N article ids for user, computing them on a miss."""
+    ids = cache.get(cache_key(user.pk))
+    if ids is None:
+        ids = score_users([user.pk])[user.pk]
+        cache.set(cache_key(user.pk), ids, CACHE_TTL)
+    return ids
@@ -0,0 +1,186 @@
+"""
+Item-to-item "related articles".
+
+Every published article gets one sparse feature row made of three
+L2-normalized blocks, each scaled by the square root of its weight:
+
+* interactions — the users who liked or bookmarked it (co-likes, co-bookmarks),
+* content — TF-IDF of title and body,
+* category — one-hot.
+
+The dot product of two rows is then the weighted sum of the three cosine
+similarities, so the neighbours of many articles come out of one sparse
+matrix product. The TOP_K best are stored in RelatedArticle and read on the
+detail page with a single indexed lookup.
+
+refresh() is incremental: it rebuilds only articles whose signature (version,
+which grows with votes, ratings and edits, plus bookmark count and last
+bookmark id) changed since the last run, and the articles that list them as
+neighbours. New articles do not push themselves into older lists until a full
+rebuild (refresh(full=True)), which is meant to run nightly.
+"""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max
+from scipy import sparse
+
+from .cache import article_scope, bump_scopes
+from .models import Article, Bookmark, LikeDislike, RelatedArticle, RelatedIndexState
+
+TOP_K = 6
+MIN_SCORE = 0.05
+WEIGHTS = {'interactions': 0.5, 'content': 0.35, 'category': 0.15}
+
+# TF-IDF: слова из 3+ букв; слишком редкие и слишком частые отбрасываем
+TOKEN_RE = re.compile(r'[^\W\d_]{3,}')
+MIN_DF = 2
+MAX_DF_RATIO = 0.5
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sparse.diags(scale) @ matrix
+
+
+def _interaction_matrix(positions):
+    """articles × users, 1 per like and per bookmark."""
+    pairs = list(LikeDislike.objects.filter(value=1).values_list('article_id', 'user_id'))
+    pairs += Bookmark.objects.values_list('article_id', 'user_id')
+    pairs = [(positions[a], u) for a, u in pairs if a in positions]
+    if not pairs:
+        return sparse.csr_matrix((len(positions), 1))
+    rows, users = np.array(pairs).T
+    user_ids, columns = np.unique(users, return_inverse=True)
+    return sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(len(positions), len(user_ids)),
+    )
+
+
+def _category_matrix(categories):
+    """articles × categories one-hot; articles without a category get an empty row."""
+    has_category = np.array([c is not None for c in categories])
+    category_ids, columns = np.unique(np.array([c or 0 for c in categories]), return_inverse=True)
+    rows = np.flatnonzero(has_category)
+    return sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns[rows])), shape=(len(categories), len(category_ids)),
+    )
+
+
+def _tfidf_matrix(texts):
+    """articles × terms, sublinear tf times smoothed idf."""
+    counts = [Counter(TOKEN_RE.findall(text.lower())) for text in texts]
+    df = Counter(term for doc in counts for term in doc)
+    max_df = max(MIN_DF, MAX_DF_RATIO * len(texts))
+    vocabulary = {term: i for i, term in enumerate(t for t, n in df.items() if MIN_DF <= n <= max_df)}
+    rows, columns, values = [], [], []
+    for row, doc in enumerate(counts):
+        for term, tf in doc.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+                values.append(1 + math.log(tf))
+    matrix = sparse.csr_matrix((values, (rows, columns)), shape=(len(texts), max(1, len(vocabulary))))
+    idf = np.ones(matrix.shape[1])
+    for term, column in vocabulary.items():
+        idf[column] = math.log((1 + len(texts)) / (1 + df[term])) + 1
+    return matrix @ sparse.diags(idf)
+
+
+def feature_matrix(articles):
+    """Combined feature rows for [(id, category_id, title, content)], in that order."""
+    positions = {pk: i for i, (pk, *_) in enumerate(articles)}
+    blocks = {
+        'interactions': _interaction_matrix(positions),
+        'content': _tfidf_matrix([f'{title} {content}' for _, _, title, content in articles]),
+        'category': _category_matrix([category for _, category, _, _ in articles]),
+    }
+    return sparse.hstack(
+        [math.sqrt(WEIGHTS[name]) * _normalize_rows(block) for name, block in blocks.items()], format='csr',
+    )
+
+
+def top_neighbours(features, targets, top_k=TOP_K):
+    """{row: [(neighbour_row, score), ...]} for the target rows, best first, self excluded."""
+    similarity = (features[targets] @ features.T).tocsr()
+    result = {}
+    for i, row in enumerate(targets):
+        start, end = similarity.indptr[i], similarity.indptr[i + 1]
+        columns, scores = similarity.indices[start:end], similarity.data[start:end]
+        keep = (columns != row) & (scores >= MIN_SCORE)
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            columns, scores = columns[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        result[row] = list(zip(columns[order].tolist(), scores[order].tolist()))
+    return result
+
+
+def _signatures():
+    rows = (
+        Article.objects.filter(is_published=True).order_by()
+        .annotate(bookmarks_n=Count('bookmarks'), last_bookmark=Max('bookmarks__id'))
+        .values_list('id', 'version', 'bookmarks_n', 'last_bookmark')
+    )
+    return {pk: f'{version}:{n}:{last or 0}' for pk, version, n, last in rows}
+
+
+def refresh(full=False, batch_size=1000):
+    """Rebuild RelatedArticle for stale articles (all published ones with full=True); returns how many."""
+    current = _signatures()
+    stored = dict(RelatedIndexState.objects.values_list('article_id', 'signature'))
+    gone = set(stored) - set(current)
+    if full:
+        stale = set(current)
+    else:
+        changed = {pk for pk, signature in current.items() if stored.get(pk) != signature}
+        # соседи изменившихся статей тоже могли сменить порядок
+        pointing = RelatedArticle.objects.filter(related_id__in=changed | gone).values_list('article_id', flat=True)
+        stale = changed | (set(pointing) & set(current))
+
+    with transaction.atomic():
+        RelatedArticle.objects.filter(article_id__in=gone).delete()
+        RelatedIndexState.objects.filter(article_id__in=gone).delete()
+    if not stale:
+        return 0
+
+    articles = list(
+        Article.objects.filter(is_published=True).order_by('id').values_list('id', 'category_id', 'title', 'content')
+    )
+    ids = [pk for pk, *_ in articles]
+    features = feature_matrix(articles)
+    targets = sorted(i for i, pk in enumerate(ids) if pk in stale)
+    for start in range(0, len(targets), batch_size):
+        batch = targets[start:start + batch_size]
+        neighbours = top_neighbours(features, batch)
+        batch_ids = [ids[row] for row in batch]
+        with transaction.atomic():
+            RelatedArticle.objects.filter(article_id__in=batch_ids).delete()
+            RelatedArticle.objects.bulk_create([
+                RelatedArticle(article_id=ids[row], related_id=ids[column], rank=rank, score=score)
+                for row in batch
+                for rank, (column, score) in enumerate(neighbours[row])
+            ])
+            RelatedIndexState.objects.filter(article_id__in=batch_ids).delete()
+            RelatedIndexState.objects.bulk_create([
+                RelatedIndexState(article_id=pk, signature=current[pk]) for pk in batch_ids
+            ])
+            transaction.on_commit(lambda batch_ids=batch_ids: bump_scopes(*map(article_scope, batch_ids)))
+    return len(targets)
+
+
+def related_for(article, limit=TOP_K):
+    """Neighbours of article for the detail page: one query over the (article, rank) index."""
+    links = (
+        RelatedArticle.objects.filter(article=article, related__is_published=True)
+        .select_related('related__author', 'related__category')
+        .defer(*[f'related__{name}' for name in Article.LIST_DEFERRED_FIELDS])
+        .order_by('rank')[:limit]
+    )
+    return [link.related for link in links]
@@ -0,0 +1,149 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Article
+
+FTS_TABLE = 'articles_article_fts'
+
+# веса bm25 по колонкам: title, content, author, category
+BM25_WEIGHTS = (10.0, 1.0, 3.0, 2.0)
+
+INDEX_ROWS_SQL = """
+    SELECT a.id, a.title, a.content,
+           COALESCE((SELECT username FROM users_user WHERE id = a.author_id), ''),
+           COALESCE((SELECT name FROM articles_category WHERE id = a.category_id), '')
+    FROM articles_article a
+"""
+
+# поля статьи, изменение которых требует переиндексации
+INDEXED_FIELDS = {'title', 'content', 'author', 'category'}
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+    USING fts5(title, content, author, category, tokenize = 'unicode61 remove_diacritics 2')
+    """,
+]
+
+# Индекс синхронизируется сигналами (articles/signals.py), а не SQL-триггерами:
+# SQLite-миграции Django пересоздают articles_article, что ломает триггеры.
+DROP_SQL = [
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def is_available(using=None):
+    return (connection if using is None else using).vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Turn free user input into a safe FTS5 expression: every word becomes a
+    quoted prefix term and all of them must match. Returns None for input
+    without searchable words.
+    """
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms[:16])
+
+
+def rebuild_index():
+    """Refill the FTS table from articles_article. Returns the number of indexed articles."""
+    with connection.cursor() as cursor:
+        for statement in CREATE_SQL:
+            cursor.execute(statement)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}(rowid, title, content, author, category) {INDEX_ROWS_SQL}")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def index_articles(pks):
+    """(Re)index the given articles; called from post_save."""
+    pks = [int(pk) for pk in pks]
+    if not pks or not is_available():
+        return
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", pks)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, content, author, category) "
+            f"{INDEX_ROWS_SQL} WHERE a.id IN ({placeholders})",
+            pks,
+        )
+
+
+def unindex_articles(pks):
+    pks = [int(pk) for pk in pks]
+    if not pks or not is_available():
+        return
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", pks)
+
+
+def rename_column_value(column, fk_column, pk, value):
+    """Propagate a category or author rename into the indexed rows."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET {column} = %s "
+            f"WHERE rowid IN (SELECT id FROM articles_article WHERE {fk_column} = %s)",
+            [value, pk],
+        )
+
+
+def filter_queryset(queryset, text):
+    """Restrict an Article queryset to rows matching text (unranked; used by the admin)."""
+    match = build_match_query(text)
+    if match is None:
+        return queryset
+    if not is_available():
+        return queryset.filter(Q(title__icontains=text) | Q(content__icontains=text))
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    )
+
+
+def search_articles(text, page=1, per_page=20):
+    """
+    Published articles matching text, best bm25 rank first.
+
+    Returns (articles, has_next) for the requested 1-based page.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return [], False
+    offset = (page - 1) * per_page
+
+    if is_available():
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT a.id FROM {FTS_TABLE}
+                JOIN articles_article a ON a.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s AND a.is_published
+                ORDER BY bm25({FTS_TABLE}, {weights})
+                LIMIT %s OFFSET %s
+                """,
+                [match, per_page + 1, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+    else:
+        ids = list(
+            filter_queryset(Article.objects.filter(is_published=True), text)
+            .order_by('-created_at', '-id')
+            .values_list('pk', flat=True)[offset:offset + per_page + 1]
+        )
+
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    by_id = Article.objects.for_list().in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id], has_next
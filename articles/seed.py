@@ -0,0 +1,130 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from . import search
+from .cache import FEEDS_SCOPE, bump_scopes, category_scope
+from .models import Article, Bookmark, Category, LikeDislike, Rating
+from .services import refresh_article_stats, refresh_author_stats
+
+User = get_user_model()
+
+SEED_PREFIX = 'seed'
+SEED_PASSWORD = 'seed-pass-123'
+CATEGORIES = ['Backend', 'Frontend', 'DevOps', 'Data', 'Mobile', 'Security', 'Career', 'Hardware']
+WORDS = (
+    'django python postgres cache index query async feed vote rating latency queue worker '
+    'search profile deploy memory thread request response template model migration'
+).split()
+BATCH_SIZE = 1000
+
+
+def _zipf_weights(n, s):
+    # вес ранга k ~ 1 / k^s: несколько «звёзд» и длинный хвост
+    return list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _pairs(rng, users, articles, count, user_weights, article_weights):
+    # уникальные пары (user, article); перекос по обеим сторонам, как в реальной активности
+    limit = min(count, len(users) * len(articles))
+    pairs = set()
+    attempts = 0
+    while len(pairs) < limit and attempts < limit * 20:
+        attempts += 1
+        user = rng.choices(users, cum_weights=user_weights)[0]
+        article = rng.choices(articles, cum_weights=article_weights)[0]
+        pairs.add((user, article))
+    return sorted(pairs)
+
+
+def seed(users=100, articles=500, votes=5000, ratings=2000, bookmarks=1000,
+         skew=1.1, published_ratio=0.9, random_seed=0, stdout=None):
+    """
+    Create synthetic users, articles, votes, ratings and bookmarks.
+
+    Authorship, article popularity and user activity follow Zipf-like
+    distributions with exponent ``skew``, so a few authors write most of the
+    articles and a few articles collect most of the votes. Rows are written
+    with bulk_create and counters are rebuilt afterwards, exactly as after
+    import_jsonl. Returns a dict of row counts per model.
+    """
+    rng = random.Random(random_seed)
+    log = stdout.write if stdout else (lambda message: None)
+
+    with transaction.atomic():
+        Category.objects.bulk_create(
+            [Category(name=name, slug=name.lower()) for name in CATEGORIES], ignore_conflicts=True,
+        )
+        categories = list(Category.objects.filter(slug__in=[name.lower() for name in CATEGORIES]))
+
+        start = User.objects.filter(username__startswith=f'{SEED_PREFIX}-').count()
+        password = make_password(SEED_PASSWORD)  # хешируем один раз, а не на каждого пользователя
+        new_users = [
+            User(username=f'{SEED_PREFIX}-{start + i}', email=f'{SEED_PREFIX}-{start + i}@example.com',
+                 password=password)
+            for i in range(users)
+        ]
+        User.objects.bulk_create(new_users, batch_size=BATCH_SIZE)
+        user_ids = list(
+            User.objects.filter(username__in=[u.username for u in new_users]).values_list('pk', flat=True)
+        )
+        log(f"{len(user_ids)} user(s)")
+
+        # перемешиваем, чтобы самые активные пользователи не совпадали с самыми плодовитыми авторами
+        author_ids = user_ids[:]
+        rng.shuffle(author_ids)
+        author_weights = _zipf_weights(len(author_ids), skew)
+        new_articles = [
+            Article(
+                author_id=rng.choices(author_ids, cum_weights=author_weights)[0],
+                category=rng.choice(categories),
+                title=_text(rng, rng.randint(3, 8)).capitalize(),
+                content=_text(rng, rng.randint(80, 400)),
+                image='articles/seed.jpg',
+                is_published=rng.random() < published_ratio,
+            )
+            for _ in range(articles)
+        ]
+        for article in new_articles:
+            article.render_content()
+        created = Article.objects.bulk_create(new_articles, batch_size=BATCH_SIZE)
+        article_ids = [a.pk for a in created]
+        published_ids = [a.pk for a in created if a.is_published]
+        log(f"{len(article_ids)} article(s)")
+
+        counts = {'users': len(user_ids), 'articles': len(article_ids)}
+        if published_ids:
+            rng.shuffle(published_ids)
+            article_weights = _zipf_weights(len(published_ids), skew)
+            user_weights = _zipf_weights(len(user_ids), skew / 2)
+
+            vote_rows = [
+                LikeDislike(user_id=u, article_id=a, value=1 if rng.random() < 0.8 else -1)
+                for u, a in _pairs(rng, user_ids, published_ids, votes, user_weights, article_weights)
+            ]
+            LikeDislike.objects.bulk_create(vote_rows, batch_size=BATCH_SIZE)
+            rating_rows = [
+                Rating(user_id=u, article_id=a, value=rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 3, 5, 6))[0])
+                for u, a in _pairs(rng, user_ids, published_ids, ratings, user_weights, article_weights)
+            ]
+            Rating.objects.bulk_create(rating_rows, batch_size=BATCH_SIZE)
+            bookmark_rows = [
+                Bookmark(user_id=u, article_id=a)
+                for u, a in _pairs(rng, user_ids, published_ids, bookmarks, user_weights, article_weights)
+            ]
+            Bookmark.objects.bulk_create(bookmark_rows, batch_size=BATCH_SIZE)
+            counts.update(votes=len(vote_rows), ratings=len(rating_rows), bookmarks=len(bookmark_rows))
+            log(f"{len(vote_rows)} vote(s), {len(rating_rows)} rating(s), {len(bookmark_rows)} bookmark(s)")
+
+        refresh_article_stats(Article.objects.filter(pk__in=article_ids))
+        refresh_author_stats()
+        search.index_articles(article_ids)
+        transaction.on_commit(lambda: bump_scopes(FEEDS_SCOPE, *(category_scope(c.slug) for c in categories)))
+    return counts
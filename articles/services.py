@@ -0,0 +1,424 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from . import metrics, overlay
+from .cache import invalidate_article, invalidate_articles
+from .models import Article, AuthorStats, Bookmark, LikeDislike, Rating
+from .ranking import popularity_score
+
+
+def vote_percent(likes, dislikes):
+    total = likes + dislikes
+    return round((likes / total) * 100, 1) if total > 0 else 0
+
+
+def _lock_article(article, now):
+    """
+    Bump the article's version with the first statement of the transaction.
+
+    SQLite gives the write lock to whoever asks first; a transaction that has
+    already read and then tries to write fails at once with "database is
+    locked" (the busy timeout does not apply). Starting with this UPDATE makes
+    concurrent writers queue here, and the counters read afterwards cannot
+    change until commit.
+    """
+    # update() обходит auto_now, а по updated_at идёт инкрементальная выгрузка
+    Article.objects.filter(pk=article.pk).update(version=F('version') + 1, updated_at=now)
+
+
+def toggle_vote(user, article, value):
+    """
+    Like (value=1) or dislike (value=-1) an article on behalf of user.
+
+    Voting the same way twice removes the vote, voting the other way switches it.
+    Counters on the article are adjusted in the same transaction, so feeds can
+    read likes_count / dislikes_count / rating_percent without touching votes.
+    """
+    with transaction.atomic():
+        _lock_article(article, timezone.now())
+        article.refresh_from_db(fields=['likes_count', 'dislikes_count', 'rating', 'rating_count'])
+        existing_vote = LikeDislike.objects.filter(user=user, article=article).first()
+        deltas = {1: 0, -1: 0}
+
+        if existing_vote and existing_vote.value == value:
+            existing_vote.delete()
+            deltas[value] -= 1
+        elif existing_vote:
+            deltas[existing_vote.value] -= 1
+            existing_vote.value = value
+            existing_vote.save(update_fields=['value'])
+            deltas[value] += 1
+        else:
+            LikeDislike.objects.create(user=user, article=article, value=value)
+            deltas[value] += 1
+
+        article.likes_count += deltas[1]
+        article.dislikes_count += deltas[-1]
+        article.rating_percent = vote_percent(article.likes_count, article.dislikes_count)
+        article.popularity = popularity_score(
+            article.likes_count, article.dislikes_count, article.rating, article.rating_count
+        )
+        Article.objects.filter(pk=article.pk).update(
+            likes_count=F('likes_count') + deltas[1],
+            dislikes_count=F('dislikes_count') + deltas[-1],
+            rating_percent=article.rating_percent,
+            popularity=article.popularity,
+        )
+        if article.is_published and deltas[1]:
+            AuthorStats.objects.filter(author_id=article.author_id).update(total_likes=F('total_likes') + deltas[1])
+        transaction.on_commit(lambda: invalidate_article(article, affects_feeds=article.is_published))
+        transaction.on_commit(lambda: metrics.inc('habr_interaction_writes_total', kind='vote', source='single'))
+
+    return article
+
+
+def rate_article(user, article, value):
+    """
+    Store user's 1-5 rating and refresh the article average and popularity.
+
+    rating_sum / rating_count and the histogram bucket columns are adjusted
+    with F() deltas, so the cost does not depend on how many ratings the
+    article already has.
+    """
+    value = max(1, min(5, int(value)))
+    with transaction.atomic():
+        _lock_article(article, timezone.now())
+        article.refresh_from_db(fields=['likes_count', 'dislikes_count', 'rating_sum', 'rating_count',
+                                        *Article.HISTOGRAM_FIELDS])
+        previous = (
+            Rating.objects.filter(user=user, article=article)
+            .values_list('value', flat=True)
+            .first()
+        )
+        if previous == value:
+            return article
+
+        bucket = Article.histogram_field(value)
+        changes = {
+            'rating_sum': F('rating_sum') + value - (previous or 0),
+            bucket: F(bucket) + 1,
+        }
+        article.rating_sum += value - (previous or 0)
+        setattr(article, bucket, getattr(article, bucket) + 1)
+        if previous is None:
+            Rating.objects.create(user=user, article=article, value=value)
+            changes['rating_count'] = F('rating_count') + 1
+            article.rating_count += 1
+        else:
+            Rating.objects.filter(user=user, article=article).update(value=value)
+            old_bucket = Article.histogram_field(previous)
+            changes[old_bucket] = F(old_bucket) - 1
+            setattr(article, old_bucket, getattr(article, old_bucket) - 1)
+        article.rating = round(article.rating_sum / article.rating_count, 2)
+        article.popularity = popularity_score(
+            article.likes_count, article.dislikes_count, article.rating, article.rating_count
+        )
+        Article.objects.filter(pk=article.pk).update(**changes, rating=article.rating, popularity=article.popularity)
+        if article.is_published:
+            AuthorStats.objects.filter(author_id=article.author_id).update(
+                rating_sum=F('rating_sum') + value - (previous or 0),
+                rating_count=F('rating_count') + (previous is None),
+            )
+        transaction.on_commit(lambda: invalidate_article(article, affects_feeds=article.is_published))
+        transaction.on_commit(lambda: metrics.inc('habr_interaction_writes_total', kind='rating', source='single'))
+    return article
+
+
+STATS_FIELDS = [
+    'likes_count', 'dislikes_count', 'rating_percent',
+    'rating', 'rating_sum', 'rating_count', *Article.HISTOGRAM_FIELDS,
+    'popularity',
+]
+
+
+def _expected_stats(article_ids):
+    votes = defaultdict(Counter)
+    for article_id, value, n in (
+        LikeDislike.objects.filter(article_id__in=article_ids).order_by()
+        .values_list('article_id', 'value').annotate(n=Count('id'))
+    ):
+        votes[article_id][value] = n
+    ratings = defaultdict(Counter)
+    for article_id, value, n in (
+        Rating.objects.filter(article_id__in=article_ids).order_by()
+        .values_list('article_id', 'value').annotate(n=Count('id'))
+    ):
+        ratings[article_id][value] = n
+
+    for article_id in article_ids:
+        likes, dislikes = votes[article_id][1], votes[article_id][-1]
+        histogram = ratings[article_id]
+        rating_count = sum(histogram.values())
+        rating_sum = sum(v * n for v, n in histogram.items())
+        rating = round(rating_sum / rating_count, 2) if rating_count else 0.0
+        stats = {
+            'likes_count': likes,
+            'dislikes_count': dislikes,
+            'rating_percent': vote_percent(likes, dislikes),
+            'rating': rating,
+            'rating_sum': rating_sum,
+            'rating_count': rating_count,
+            'popularity': popularity_score(likes, dislikes, rating, rating_count),
+        }
+        for value in range(1, 6):
+            stats[Article.histogram_field(value)] = histogram[value]
+        yield article_id, stats
+
+
+def refresh_article_stats(queryset=None, batch_size=500, dry_run=False):
+    """
+    Reconcile every derived vote/rating column (counters, rating aggregates
+    and histogram, popularity) with LikeDislike and Rating rows, using two
+    grouped queries per batch of articles. Only rows that drifted are written
+    (and get a new version).
+
+    Returns (processed, drifted_ids). Used by the rebuild/reconcile commands
+    and by bulk write paths.
+    """
+    articles = Article.objects.all() if queryset is None else queryset
+    articles = articles.only('id', *STATS_FIELDS).order_by('pk')
+
+    processed = 0
+    drifted = []
+    now = timezone.now()
+    batch = list(articles[:batch_size])
+    while batch:
+        stored = {a.pk: a for a in batch}
+        changed = []
+        for article_id, stats in _expected_stats(list(stored)):
+            article = stored[article_id]
+            if any(getattr(article, name) != value for name, value in stats.items()):
+                for name, value in stats.items():
+                    setattr(article, name, value)
+                article.version = F('version') + 1
+                article.updated_at = now
+                changed.append(article)
+        if changed and not dry_run:
+            Article.objects.bulk_update(changed, [*STATS_FIELDS, 'version', 'updated_at'])
+        drifted += [a.pk for a in changed]
+        processed += len(batch)
+        batch = list(articles.filter(pk__gt=batch[-1].pk)[:batch_size])
+    return processed, drifted
+
+
+AUTHOR_STATS_FIELDS = ['published_count', 'total_likes', 'rating_sum', 'rating_count', 'latest_article_at']
+
+
+def refresh_author_stats(author_ids=None):
+    """
+    Recompute AuthorStats from the authors' published articles with one
+    grouped query; authors left without published articles lose their row.
+    author_ids=None rebuilds the whole table. Returns the number of rows written.
+
+    The vote and rating paths adjust the totals with F() deltas instead;
+    this is for publishing, edits, deletes and bulk writes.
+    """
+    articles = Article.objects.filter(is_published=True).order_by()
+    if author_ids is not None:
+        author_ids = set(author_ids)
+        articles = articles.filter(author_id__in=author_ids)
+    stats = [
+        AuthorStats(
+            author_id=row['author_id'], published_count=row['n'], total_likes=row['likes'],
+            rating_sum=row['rating_sum_total'], rating_count=row['rating_count_total'],
+            latest_article_at=row['latest'],
+        )
+        for row in articles.values('author_id').annotate(
+            n=Count('id'), likes=Sum('likes_count'), rating_sum_total=Sum('rating_sum'),
+            rating_count_total=Sum('rating_count'), latest=Max('created_at'),
+        )
+    ]
+    # без savepoint: внутри горячих путей это ещё два запроса
+    with transaction.atomic(savepoint=False):
+        if author_ids is None:
+            AuthorStats.objects.all().delete()
+            AuthorStats.objects.bulk_create(stats, batch_size=500)
+        else:
+            emptied = author_ids - {s.author_id for s in stats}
+            if emptied:
+                AuthorStats.objects.filter(author_id__in=emptied).delete()
+            AuthorStats.objects.bulk_create(
+                stats, update_conflicts=True, unique_fields=['author'], update_fields=AUTHOR_STATS_FIELDS,
+            )
+    return len(stats)
+
+
+# голос в батче не упоминался — не трогаем (None означает «снять голос»)
+_KEEP = object()
+
+COUNTER_FIELDS = ['likes_count', 'dislikes_count', 'rating_sum', 'rating_count', *Article.HISTOGRAM_FIELDS]
+
+
+def _interaction_deltas(before, vote, rating):
+    """
+    Counter changes from the user's previous interaction with an article to
+    the new state; vote=_KEEP leaves the vote alone, vote=None removes it,
+    rating=None leaves the rating alone. Only non-zero entries are kept.
+    """
+    deltas = Counter()
+    if vote is not _KEEP and (vote or 0) != before.vote:
+        for value, sign in ((before.vote, -1), (vote or 0, 1)):
+            if value:
+                deltas['likes_count' if value == 1 else 'dislikes_count'] += sign
+    if rating is not None and rating != before.rating:
+        if before.rating is not None:
+            deltas['rating_sum'] -= before.rating
+            deltas['rating_count'] -= 1
+            deltas[Article.histogram_field(before.rating)] -= 1
+        deltas['rating_sum'] += rating
+        deltas['rating_count'] += 1
+        deltas[Article.histogram_field(rating)] += 1
+    return Counter({name: delta for name, delta in deltas.items() if delta})
+
+
+def _apply_deltas(article, deltas):
+    """
+    Set the counters of article (loaded under the write lock) to F() + delta
+    and recompute the derived columns from the resulting values. The
+    in-memory counters are updated too, for the response.
+    """
+    for name in COUNTER_FIELDS:
+        setattr(article, name, getattr(article, name) + deltas[name])
+    article.rating_percent = vote_percent(article.likes_count, article.dislikes_count)
+    article.rating = round(article.rating_sum / article.rating_count, 2) if article.rating_count else 0.0
+    article.popularity = popularity_score(
+        article.likes_count, article.dislikes_count, article.rating, article.rating_count
+    )
+    return Article(
+        pk=article.pk,
+        **{name: F(name) + deltas[name] for name in COUNTER_FIELDS},
+        rating_percent=article.rating_percent, rating=article.rating, popularity=article.popularity,
+    )
+
+
+INTERACTION_TYPES = ('like', 'dislike', 'unvote', 'bookmark', 'unbookmark', 'rate')
+MAX_BATCH_SIZE = 500
+
+
+def apply_interactions(user, items):
+    """
+    Apply a batch of queued interactions for user in one transaction.
+
+    Items are dicts {"type": ..., "article": <pk>, "value": <1-5, for rate>}.
+    Unlike the single-article endpoints they set state rather than toggle it
+    ("like" means "make it a like", "unvote" removes the vote), so replaying
+    an offline queue twice is harmless. Later items for the same article win.
+    Counters and AuthorStats move by F() deltas against the user's previous
+    votes and ratings, read in one query, as on the single-article paths.
+
+    Returns (results, articles): a per-item list of {"index", "status"[, "error"]}
+    and the resulting counters for every touched article, keyed by pk.
+    """
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({'index': index, 'status': 'error', 'error': 'item must be an object'})
+            continue
+        kind = item.get('type')
+        try:
+            article_id = int(item.get('article'))
+            value = int(item['value']) if kind == 'rate' else None
+        except (TypeError, ValueError, KeyError):
+            results.append({'index': index, 'status': 'error', 'error': 'invalid article or value'})
+            continue
+        if kind not in INTERACTION_TYPES:
+            results.append({'index': index, 'status': 'error', 'error': f'unknown type {kind!r}'})
+            continue
+        if value is not None and not 1 <= value <= 5:
+            results.append({'index': index, 'status': 'error', 'error': 'rating must be between 1 and 5'})
+            continue
+        results.append({'index': index, 'status': 'ok'})
+        valid.append((index, kind, article_id, value))
+
+    existing = set(Article.objects.filter(pk__in={a for _, _, a, _ in valid}).values_list('pk', flat=True))
+    votes, bookmarks, ratings = {}, {}, {}
+    for index, kind, article_id, value in valid:
+        if article_id not in existing:
+            results[index] = {'index': index, 'status': 'error', 'error': 'article not found'}
+        elif kind in ('like', 'dislike', 'unvote'):
+            votes[article_id] = {'like': 1, 'dislike': -1, 'unvote': None}[kind]
+        elif kind in ('bookmark', 'unbookmark'):
+            bookmarks[article_id] = kind == 'bookmark'
+        else:
+            ratings[article_id] = value
+
+    with transaction.atomic():
+        touched = set(votes) | set(ratings)
+        if touched:
+            # сначала запись (см. _lock_article), затем счётчики и прежние голоса/оценки пользователя
+            Article.objects.filter(pk__in=touched).update(version=F('version') + 1, updated_at=timezone.now())
+            stored = Article.objects.filter(pk__in=touched).only(
+                'id', 'author_id', 'category_id', 'is_published', *STATS_FIELDS,
+            ).in_bulk()
+            previous = overlay.interactions_for(user, touched)
+
+        upserts = [LikeDislike(user=user, article_id=a, value=v) for a, v in votes.items() if v is not None]
+        if upserts:
+            LikeDislike.objects.bulk_create(
+                upserts, update_conflicts=True, unique_fields=['user', 'article'], update_fields=['value']
+            )
+        removed = [a for a, v in votes.items() if v is None]
+        if removed:
+            LikeDislike.objects.filter(user=user, article_id__in=removed).delete()
+
+        added = [Bookmark(user=user, article_id=a) for a, keep in bookmarks.items() if keep]
+        if added:
+            Bookmark.objects.bulk_create(added, ignore_conflicts=True)
+        removed = [a for a, keep in bookmarks.items() if not keep]
+        if removed:
+            Bookmark.objects.filter(user=user, article_id__in=removed).delete()
+
+        if ratings:
+            Rating.objects.bulk_create(
+                [Rating(user=user, article_id=a, value=v) for a, v in ratings.items()],
+                update_conflicts=True, unique_fields=['user', 'article'], update_fields=['value'],
+            )
+
+        articles = {}
+        if touched:
+            changed, author_deltas = [], defaultdict(Counter)
+            for article_id, article in stored.items():
+                deltas = _interaction_deltas(
+                    previous.get(article_id, overlay.Interaction()), votes.get(article_id, _KEEP),
+                    ratings.get(article_id),
+                )
+                if deltas:
+                    changed.append(_apply_deltas(article, deltas))
+                    if article.is_published:
+                        author_deltas[article.author_id].update({
+                            'total_likes': deltas['likes_count'],
+                            'rating_sum': deltas['rating_sum'],
+                            'rating_count': deltas['rating_count'],
+                        })
+                articles[article_id] = {
+                    'likes': article.likes_count,
+                    'dislikes': article.dislikes_count,
+                    'rating_percent': article.rating_percent,
+                    'rating': article.rating,
+                }
+            if changed:
+                Article.objects.bulk_update(changed, STATS_FIELDS)
+            if author_deltas:
+                AuthorStats.objects.bulk_update(
+                    [
+                        AuthorStats(author_id=author_id, **{name: F(name) + delta for name, delta in deltas.items()})
+                        for author_id, deltas in author_deltas.items()
+                    ],
+                    ['total_likes', 'rating_sum', 'rating_count'],
+                )
+            published = [a for a in stored.values() if a.is_published]
+            transaction.on_commit(lambda: invalidate_articles(published))
+
+        writes = {'vote': len(votes), 'rating': len(ratings), 'bookmark': len(bookmarks)}
+        for kind, count in writes.items():
+            if count:
+                transaction.on_commit(
+                    lambda kind=kind, count=count: metrics.inc('habr_interaction_writes_total', count,
+                                                               kind=kind, source='batch')
+                )
+
+    return results, articles
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import images, jobs, moderation, search
+from .cache import enqueue_warm, invalidate_article, touch_articles
+from .models import Article, Category, LikeDislike, Rating
+from .services import refresh_author_stats
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def article_changed(sender, instance, **kwargs):
+    # сохранения редки (правка, модерация), поэтому ленты сбрасываем всегда —
+    # иначе пришлось бы помнить прежнее значение is_published
+    previous_category_id = getattr(instance, '_loaded_category_id', None)
+    instance._loaded_category_id = instance.category_id
+    transaction.on_commit(lambda: invalidate_article(instance, previous_category_id=previous_category_id))
+    transaction.on_commit(moderation.invalidate_pending_counts)
+
+
+@receiver(post_save, sender=Article)
+def article_saved_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or search.INDEXED_FIELDS & set(update_fields):
+        search.index_articles([instance.pk])
+
+
+@receiver(post_save, sender=Article)
+def article_saved_jobs(sender, instance, update_fields=None, **kwargs):
+    # job пишется в той же транзакции, что и статья: воркер увидит его только после коммита
+    if (update_fields is None or 'image' in update_fields) and images.variants_stale(instance):
+        jobs.enqueue('build_image_variants', {'article_id': instance.pk}, unique_key=f'images:{instance.pk}')
+    if instance.is_published:
+        enqueue_warm([instance.pk], unique_key=f'warm:{instance.pk}')
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def article_changed_author_stats(sender, instance, update_fields=None, **kwargs):
+    # голоса и оценки сюда не попадают: их учитывают F()-дельты в services.py
+    if update_fields is None or {'is_published', 'author'} & set(update_fields):
+        refresh_author_stats([instance.author_id])
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted_index(sender, instance, **kwargs):
+    search.unindex_articles([instance.pk])
+
+
+def _stored_value(sender, instance, field, update_fields):
+    # прежнее значение поля из БД; None — новая запись или поле не сохраняется
+    if instance.pk is None or update_fields is not None and field not in update_fields:
+        return None
+    return sender._default_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Category)
+def category_saving(sender, instance, update_fields=None, **kwargs):
+    instance._stored_name = _stored_value(sender, instance, 'name', update_fields)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def author_saving(sender, instance, update_fields=None, **kwargs):
+    # не на каждый логин (update_fields=['last_login'])
+    instance._stored_username = _stored_value(sender, instance, 'username', update_fields)
+
+
+@receiver(post_save, sender=Category)
+def category_renamed(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stored_name', None)
+    if not created and previous is not None and previous != instance.name:
+        search.rename_column_value('category', 'category_id', instance.pk, instance.name)
+        # имя категории есть в каждой карточке — меняем версию, иначе фрагменты живут сутки
+        touch_articles(Article.objects.filter(category_id=instance.pk))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def author_renamed(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stored_username', None)
+    if not created and previous is not None and previous != instance.username:
+        search.rename_column_value('author', 'author_id', instance.pk, instance.username)
+        touch_articles(Article.objects.filter(author_id=instance.pk))
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def voter_deleting(sender, instance, **kwargs):
+    # голоса и оценки уйдут каскадом мимо F()-дельт services.py — запоминаем статьи для пересчёта
+    instance._voted_article_ids = list(
+        LikeDislike.objects.filter(user=instance).values_list('article_id', flat=True)
+        .union(Rating.objects.filter(user=instance).values_list('article_id', flat=True))
+    )
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def voter_deleted(sender, instance, **kwargs):
+    article_ids = getattr(instance, '_voted_article_ids', None)
+    if article_ids:
+        jobs.enqueue('refresh_article_stats', {'article_ids': article_ids})
@@ -0,0 +1,37 @@
+"""Job handlers; imported from ArticlesConfig.ready so every worker knows them."""
+from . import images, related
+from .cache import cache_is_shared, invalidate_articles, warm_fragments
+from .jobs import task
+from .models import Article
+from .services import refresh_article_stats, refresh_author_stats
+
+
+@task('build_image_variants')
+def build_image_variants(article_id):
+    article = Article.objects.filter(pk=article_id).only(
+        'id', 'image', 'image_variants', 'category_id', 'is_published',
+    ).first()
+    # статью могли удалить или сменить картинку ещё раз — тогда соберёт следующий job
+    if article is not None and images.variants_stale(article):
+        images.build_variants(article)
+
+
+@task('refresh_article_stats')
+def refresh_stats(article_ids):
+    articles = Article.objects.filter(pk__in=article_ids)
+    _, drifted = refresh_article_stats(articles)
+    refresh_author_stats(articles.values_list('author_id', flat=True))
+    if drifted:
+        invalidate_articles(Article.objects.filter(pk__in=drifted).only('pk', 'category_id'))
+
+
+@task('warm_article_cache')
+def warm_article_cache(article_ids):
+    # job мог быть поставлен до переключения на локальный кэш — в памяти воркера он бесполезен
+    if cache_is_shared():
+        warm_fragments(Article.objects.filter(pk__in=article_ids))
+
+
+@task('refresh_related_articles')
+def refresh_related_articles(full=False):
+    related.refresh(full=full)
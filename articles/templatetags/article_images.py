@@ -0,0 +1,25 @@
+from django import template
+
+register = template.Library()
+
+
+def _widths(article):
+    widths = (article.image_variants or {}).get('widths') or {}
+    return sorted((int(width), url) for width, url in widths.items())
+
+
+@register.filter
+def image_src(article, width=640):
+    """URL of the smallest variant at least `width` px wide; the original if there are no variants."""
+    variants = _widths(article)
+    if not variants:
+        return article.image.url if article.image else ''
+    for variant_width, url in variants:
+        if variant_width >= int(width):
+            return url
+    return variants[-1][1]
+
+
+@register.filter
+def image_srcset(article):
+    return ', '.join(f'{url} {width}w' for width, url in _widths(article))
@@ -0,0 +1,15 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor=None):
+    """Current URL with only the cursor swapped (dropped when None); filters like q stay."""
+    request = context['request']
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    if cursor:
+        params['cursor'] = cursor
+    query = params.urlencode()
+    return f'{request.path}?{query}' if query else request.path
@@ -1,3 +1,1314 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import F
+from django.http import HttpResponse
+from django.template import engines
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from habr.db import PIN_COOKIE, PrimaryPinMiddleware, PrimaryReplicaRouter
+
+from . import export, jobs, metrics, moderation, overlay, recommendations, related
+from .benchmarks import run_benchmarks
+from .cache import anonymous_page_cache
+from .images import build_variants
+from .instrumentation import SQLInstrumentationMiddleware, get_report
+from .models import Article, AuthorStats, Bookmark, Category, Job, LikeDislike, Rating, RelatedArticle
+from .pagination import PAGE_SIZE, KeysetPage
+from .ranking import popularity_score
+from .search import search_articles
+from .seed import seed
+from .services import rate_article, refresh_article_stats, toggle_vote
+
+User = get_user_model()
+
+
+def make_article(author, category, **kwargs):
+    kwargs.setdefault('title', 'Article')
+    kwargs.setdefault('content', 'Some content')
+    kwargs.setdefault('is_published', True)
+    kwargs.setdefault('image', 'articles/test.jpg')
+    return Article.objects.create(author=author, category=category, **kwargs)
+
+
+class ArticleTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # загрузки и варианты картинок — во временный каталог, без Cloudinary и сети
+        media_root = tempfile.mkdtemp(prefix='habr-media-')
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        storage = override_settings(
+            DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage', MEDIA_ROOT=media_root,
+        )
+        storage.enable()
+        cls.addClassCleanup(storage.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='pass12345')
+        cls.reader = User.objects.create_user('reader', password='pass12345')
+        cls.category = Category.objects.get_or_create(slug='backend', defaults={'name': 'Backend'})[0]
+        cls.article = make_article(cls.author, cls.category)
+
+    def setUp(self):
+        # фрагменты ключуются по (pk, version) и иначе переживали бы тест
+        cache.clear()
+
+
+class SharedCacheMixin:
+    """The HABR_CACHE_DIR cache for the class: the page cache is off with the per-process locmem one."""
+
+    @classmethod
+    def setUpClass(cls):
+        cache_dir = tempfile.mkdtemp(prefix='habr-cache-')
+        cls.addClassCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        shared = override_settings(CACHES={
+            'default': {'BACKEND': 'articles.cache_backends.FileBasedMetricsCache', 'LOCATION': cache_dir},
+        })
+        shared.enable()
+        cls.addClassCleanup(shared.disable)
+        super().setUpClass()
+
+
+class VoteCounterTests(ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.reader)
+
+    def vote(self, name):
+        response = self.client.post(reverse(name, args=[self.article.pk]))
+        self.article.refresh_from_db()
+        return response.json()
+
+    def test_like_toggle_and_switch(self):
+        data = self.vote('article_like')
+        self.assertEqual(data, {'likes': 1, 'dislikes': 0, 'rating_percent': 100.0})
+
+        data = self.vote('article_dislike')
+        self.assertEqual(data, {'likes': 0, 'dislikes': 1, 'rating_percent': 0.0})
+        self.assertEqual((self.article.likes_count, self.article.dislikes_count), (0, 1))
+
+        data = self.vote('article_dislike')
+        self.assertEqual(data, {'likes': 0, 'dislikes': 0, 'rating_percent': 0})
+        self.assertFalse(LikeDislike.objects.exists())
+
+    def test_rebuild_command(self):
+        LikeDislike.objects.create(user=self.reader, article=self.article, value=1)
+        LikeDislike.objects.create(user=self.author, article=self.article, value=-1)
+        call_command('rebuild_vote_counters', stdout=StringIO())
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.likes_count, self.article.dislikes_count), (1, 1))
+        self.assertEqual(self.article.rating_percent, 50.0)
+
+    def test_deleting_a_voter_recounts_their_articles(self):
+        toggle_vote(self.reader, self.article, 1)
+        rate_article(self.reader, self.article, 4)
+        toggle_vote(self.author, self.article, -1)
+        self.reader.delete()
+        jobs.run_pending()
+
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.likes_count, self.article.dislikes_count), (0, 1))
+        self.assertEqual((self.article.rating_sum, self.article.rating_count, self.article.rating_4_count), (0, 0, 0))
+        stats = AuthorStats.objects.get(author=self.author)
+        self.assertEqual((stats.total_likes, stats.rating_count), (0, 0))
+
+
+class FeedQueryCountTests(ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        # авторизованные запросы идут мимо постраничного кэша
+        self.client.force_login(self.reader)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(ctx)
+
+    def test_feeds_do_not_grow_with_article_count(self):
+        urls = [
+            reverse('feed_all'),
+            reverse('feed_popular'),
+            reverse('feed_by_category', args=['backend']),
+        ]
+        before = [self._count_queries(url) for url in urls]
+        for i in range(10):
+            article = make_article(self.author, self.category, title=f'Extra {i}')
+            LikeDislike.objects.create(user=self.reader, article=article, value=1)
+        after = [self._count_queries(url) for url in urls]
+        self.assertEqual(before, after)
+
+
+class KeysetPaginationTests(ArticleTestCase):
+    def test_pages_cover_feed_without_overlap(self):
+        for i in range(25):
+            make_article(self.author, self.category, title=f'Extra {i}')
+
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get(reverse('feed_all'), {'cursor': cursor} if cursor else {})
+            page = response.context['page']
+            seen.extend(a.pk for a in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        expected = list(
+            Article.objects.filter(is_published=True).order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('feed_popular'), {'cursor': 'garbage!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page'].has_previous)
+
+    def test_pagination_links_keep_other_params(self):
+        page = KeysetPage(object_list=[], next_cursor='next', cursor='current')
+        request = RequestFactory().get('/articles/', {'q': 'django', 'cursor': 'current'})
+        html = engines['django'].get_template('articles/_pagination.html').render({'page': page}, request)
+        self.assertIn('href="/articles/?q=django"', html)
+        self.assertIn('href="/articles/?q=django&amp;cursor=next"', html)
+
+
+class PopularityTests(ArticleTestCase):
+    def test_wilson_bound_prefers_more_evidence(self):
+        self.assertGreater(popularity_score(50, 2), popularity_score(1, 0))
+        self.assertEqual(popularity_score(0, 0), 0.0)
+
+    def test_popular_feed_orders_by_stored_score(self):
+        lucky = make_article(self.author, self.category, title='One like')
+        solid = make_article(self.author, self.category, title='Many likes')
+        voters = [User.objects.create_user(f'voter{i}') for i in range(6)]
+        toggle_vote(voters[0], lucky, 1)
+        for voter in voters:
+            toggle_vote(voter, solid, 1)
+        rate_article(self.reader, solid, 5)
+
+        solid.refresh_from_db()
+        self.assertEqual(solid.rating, 5.0)
+        self.assertGreater(solid.popularity, lucky.popularity)
+
+        response = self.client.get(reverse('feed_popular'))
+        titles = [a.title for a in response.context['page']]
+        self.assertEqual(titles[:2], ['Many likes', 'One like'])
+
+
+class FragmentCacheTests(ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.reader)
+
+    def test_card_is_served_from_cache_until_version_changes(self):
+        self.client.get(reverse('feed_popular'))
+        # меняем заголовок в обход save(): версия та же, кэш отдаёт старую карточку
+        Article.objects.filter(pk=self.article.pk).update(title='Stale title')
+        self.assertNotContains(self.client.get(reverse('feed_popular')), 'Stale title')
+
+        self.article.refresh_from_db()
+        self.article.title = 'Fresh title'
+        self.article.save()
+        self.assertContains(self.client.get(reverse('feed_popular')), 'Fresh title')
+
+    def test_vote_bumps_version(self):
+        version = self.article.version
+        toggle_vote(self.reader, self.article, 1)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.version, version + 1)
+
+    def test_warm_up_command_fills_fragments(self):
+        with self.assertRaises(CommandError):
+            call_command('warm_article_cache', stdout=StringIO())
+
+        cache_dir = tempfile.mkdtemp(prefix='habr-cache-')
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir}}
+        with override_settings(CACHES=shared):
+            call_command('warm_article_cache', stdout=StringIO())
+            key = make_template_fragment_key('article_card', [self.article.pk, self.article.version])
+            self.assertIsNotNone(cache.get(key))
+
+    def test_warm_jobs_need_a_shared_cache(self):
+        self.article.save()
+        self.assertFalse(Job.objects.filter(name='warm_article_cache').exists())
+
+
+class AnonymousPageCacheTests(SharedCacheMixin, ArticleTestCase):
+    def test_per_process_cache_is_bypassed(self):
+        url = reverse('article_detail', args=[self.article.pk])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('ETag'))
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_conditional_get_returns_304_until_vote(self):
+        url = reverse('article_detail', args=[self.article.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_vote(self.reader, self.article, 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_publishing_invalidates_only_its_category(self):
+        Category.objects.get_or_create(slug='frontend', defaults={'name': 'Frontend'})
+        feed = reverse('feed_by_category', args=['backend'])
+        other_feed = reverse('feed_by_category', args=['frontend'])
+        feed_etag = self.client.get(feed)['ETag']
+        other_etag = self.client.get(other_feed)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_article(self.author, self.category, title='Brand new')
+
+        self.assertContains(self.client.get(feed, HTTP_IF_NONE_MATCH=feed_etag), 'Brand new')
+        self.assertEqual(self.client.get(other_feed, HTTP_IF_NONE_MATCH=other_etag).status_code, 304)
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('feed_all'))
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_moving_article_invalidates_both_categories(self):
+        other = Category.objects.get_or_create(slug='frontend', defaults={'name': 'Frontend'})[0]
+        feed = reverse('feed_by_category', args=['backend'])
+        other_feed = reverse('feed_by_category', args=['frontend'])
+        with self.captureOnCommitCallbacks(execute=True):
+            pk = make_article(self.author, self.category, title='Wandering article').pk
+        self.assertContains(self.client.get(feed), 'Wandering article')
+        self.client.get(other_feed)
+
+        article = Article.objects.get(pk=pk)
+        article.category = other
+        with self.captureOnCommitCallbacks(execute=True):
+            article.save()
+
+        self.assertNotContains(self.client.get(feed), 'Wandering article')
+        self.assertContains(self.client.get(other_feed), 'Wandering article')
+
+    def test_renames_refresh_cached_cards(self):
+        feed = reverse('feed_all')
+        self.assertContains(self.client.get(feed), 'Backend')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Server side'
+            self.category.save()
+            self.author.username = 'renamed_author'
+            self.author.save()
+        response = self.client.get(feed)
+        self.assertContains(response, 'Server side')
+        self.assertContains(response, 'renamed_author')
+        self.assertNotContains(response, '👤 author')
+
+
+class SearchTests(ArticleTestCase):
+    def test_ranked_search_follows_saves_and_hides_drafts(self):
+        in_title = make_article(self.author, self.category, title='Django tuning', content='body')
+        make_article(self.author, self.category, title='Other', content='we mention django once')
+        make_article(self.author, self.category, title='Django draft', is_published=False)
+
+        articles, has_next = search_articles('djang')
+        self.assertEqual([a.title for a in articles], ['Django tuning', 'Other'])
+        self.assertFalse(has_next)
+
+        in_title.title = 'Renamed'
+        in_title.save()
+        self.assertEqual([a.title for a in search_articles('tuning')[0]], [])
+        self.assertEqual([a.title for a in search_articles('backend renamed')[0]], ['Renamed'])
+
+    def test_search_view_and_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('article_search'), {'q': 'some "content'})
+        self.assertContains(response, self.article.title)
+
+    def test_admin_search_uses_index(self):
+        admin_user = User.objects.create_superuser('root', password='pass12345')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:articles_article_changelist'), {'q': 'author'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.article])
+
+    def test_renames_propagate_to_index(self):
+        self.category.name = 'Server side'
+        self.category.save()
+        self.author.username = 'renamed_author'
+        self.author.save()
+        self.assertEqual(search_articles('server renamed_author')[0], [self.article])
+
+
+class BatchInteractionTests(ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.reader)
+
+    def post_batch(self, items):
+        return self.client.post(
+            reverse('article_interactions_batch'),
+            data=json.dumps({'interactions': items}),
+            content_type='application/json',
+        )
+
+    def test_batch_applies_final_state_with_per_item_results(self):
+        other = make_article(self.author, self.category, title='Other')
+        Bookmark.objects.create(user=self.reader, article=other)
+        response = self.post_batch([
+            {'type': 'like', 'article': self.article.pk},
+            {'type': 'dislike', 'article': self.article.pk},
+            {'type': 'bookmark', 'article': self.article.pk},
+            {'type': 'unbookmark', 'article': other.pk},
+            {'type': 'rate', 'article': other.pk, 'value': 4},
+            {'type': 'rate', 'article': other.pk, 'value': 9},
+            {'type': 'like', 'article': 999999},
+            {'type': 'poke', 'article': other.pk},
+        ])
+        data = response.json()
+        self.assertEqual(
+            [r['status'] for r in data['results']],
+            ['ok', 'ok', 'ok', 'ok', 'ok', 'error', 'error', 'error'],
+        )
+        self.assertEqual(data['articles'][str(self.article.pk)]['dislikes'], 1)
+        self.assertEqual(data['articles'][str(other.pk)]['rating'], 4.0)
+        self.assertEqual(LikeDislike.objects.get(user=self.reader).value, -1)
+        self.assertEqual(list(Bookmark.objects.filter(user=self.reader).values_list('article', flat=True)),
+                         [self.article.pk])
+
+    def test_query_count_does_not_scale_with_batch_size(self):
+        articles = [make_article(self.author, self.category, title=f'A{i}') for i in range(50)]
+        items = []
+        for a in articles:
+            items += [
+                {'type': 'like', 'article': a.pk},
+                {'type': 'bookmark', 'article': a.pk},
+                {'type': 'rate', 'article': a.pk, 'value': 5},
+            ]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.post_batch(items).status_code, 200)
+        self.assertLess(len(ctx), 20)
+        self.assertEqual(Article.objects.get(pk=articles[0].pk).likes_count, 1)
+
+    def test_counters_move_by_deltas_without_drift(self):
+        voters = [User.objects.create_user(f'voter{i}', password='pass12345') for i in range(30)]
+        for voter in voters:
+            toggle_vote(voter, self.article, 1)
+            rate_article(voter, self.article, 2)
+        toggle_vote(self.reader, self.article, -1)
+        rate_article(self.reader, self.article, 5)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.post_batch([
+                {'type': 'like', 'article': self.article.pk},
+                {'type': 'rate', 'article': self.article.pk, 'value': 3},
+            ])
+        self.assertFalse(any('GROUP BY' in q['sql'] for q in ctx.captured_queries))
+        self.post_batch([{'type': 'unvote', 'article': self.article.pk}])
+
+        self.assertEqual(refresh_article_stats(dry_run=True)[1], [])
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.likes_count, self.article.rating_3_count, self.article.rating_5_count), (30, 1, 0))
+        stats = AuthorStats.objects.get(author=self.author)
+        self.assertEqual((stats.total_likes, stats.rating_sum, stats.rating_count), (30, 63, 31))
+
+    def test_rejects_malformed_body(self):
+        response = self.client.post(reverse('article_interactions_batch'), data='nope', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncViewTests(ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.reader)
+
+    async def test_like_and_rate_update_counters(self):
+        response = await self.async_client.post(reverse('article_like_async', args=[self.article.pk]))
+        self.assertEqual(response.json()['likes'], 1)
+        response = await self.async_client.post(reverse('article_rate_async', args=[self.article.pk, 4]))
+        self.assertEqual(response.json(), {'rating': 4.0, 'rating_count': 1})
+        article = await Article.objects.aget(pk=self.article.pk)
+        self.assertEqual((article.likes_count, article.rating_sum), (1, 4))
+
+    async def test_bookmark_toggles(self):
+        url = reverse('article_bookmark_toggle_async', args=[self.article.pk])
+        self.assertTrue((await self.async_client.post(url)).json()['bookmarked'])
+        self.assertFalse((await self.async_client.post(url)).json()['bookmarked'])
+        self.assertFalse(await Bookmark.objects.filter(user=self.reader).aexists())
+
+    async def test_requires_post_login_and_existing_article(self):
+        url = reverse('article_like_async', args=[self.article.pk])
+        self.assertEqual((await self.async_client.get(url)).status_code, 405)
+        self.assertEqual((await self.async_client.post(reverse('article_like_async', args=[999999]))).status_code, 404)
+        anonymous = await AsyncClient().post(url)
+        self.assertEqual(anonymous.status_code, 302)
+
+    async def test_feeds_render(self):
+        response = await self.async_client.get(reverse('feed_all_async'))
+        self.assertContains(response, self.article.title)
+        response = await self.async_client.get(reverse('feed_by_category_async', args=[self.category.slug]))
+        self.assertContains(response, self.article.title)
+
+
+class ConcurrentVoteTests(SimpleTestCase):
+    def test_concurrent_voters_wait_for_the_write_lock(self):
+        # потокам нужна общая файловая БД, а тестовая живёт в памяти процесса,
+        # поэтому голосуем через bench_async в отдельном процессе; любой 500 — ненулевой код
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'bench_async', '--voters', '8', '--requests', '3', '--threads', '2'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('All requests succeeded', result.stdout)
+
+
+class RatingAggregateTests(ArticleTestCase):
+    def test_rating_updates_sum_count_and_histogram(self):
+        rate_article(self.reader, self.article, 5)
+        rate_article(self.author, self.article, 2)
+        rate_article(self.reader, self.article, 4)
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.rating_sum, self.article.rating_count), (6, 2))
+        self.assertEqual(self.article.rating, 3.0)
+        self.assertEqual(
+            [count for _, count, _ in self.article.rating_histogram], [0, 1, 0, 1, 0]
+        )
+
+    def test_rating_cost_is_constant(self):
+        for i in range(20):
+            Rating.objects.create(user=User.objects.create_user(f'r{i}'), article=self.article, value=3)
+        with CaptureQueriesContext(connection) as ctx:
+            rate_article(self.reader, self.article, 5)
+        self.assertFalse([q for q in ctx.captured_queries if 'AVG' in q['sql'].upper()])
+
+    def test_reconcile_command_fixes_drift(self):
+        Rating.objects.create(user=self.reader, article=self.article, value=4)
+        out = StringIO()
+        call_command('reconcile_ratings', '--dry-run', stdout=out)
+        self.assertIn(f'article {self.article.pk}', out.getvalue())
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.rating_count, 0)
+
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.rating_count, self.article.rating_4_count, self.article.rating), (1, 1, 4.0))
+
+
+class JsonApiTests(ArticleTestCase):
+    def test_list_defers_content_and_paginates(self):
+        for i in range(3):
+            make_article(self.author, self.category, title=f'Extra {i}')
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse('api_article_list'), {'limit': 2}).json()
+        self.assertEqual(len(ctx), 1)
+        self.assertNotIn('"content"', ctx.captured_queries[0]['sql'])
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][0]['author'], 'author')
+        self.assertNotIn('content', data['results'][0])
+
+        data = self.client.get(reverse('api_article_list'), {'limit': 2, 'cursor': data['next_cursor']}).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_field_projection(self):
+        data = self.client.get(reverse('api_article_list'), {'fields': 'id,content,category'}).json()
+        self.assertEqual(data['results'], [{'id': self.article.pk, 'content': 'Some content', 'category': 'backend'}])
+        response = self.client.get(reverse('api_article_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_categories_and_authors(self):
+        make_article(self.reader, self.category, is_published=False)
+        data = self.client.get(reverse('api_article_detail', args=[self.article.pk])).json()
+        self.assertEqual(data['content'], 'Some content')
+        categories = self.client.get(reverse('api_category_list')).json()['results']
+        self.assertIn({'id': self.category.pk, 'name': 'Backend', 'slug': 'backend', 'articles_count': 1}, categories)
+        with self.assertNumQueries(1):  # AuthorStats с JOIN пользователя, без подсчёта статей
+            authors = self.client.get(reverse('api_author_list')).json()['results']
+        self.assertEqual(authors, [{'id': self.author.pk, 'username': 'author', 'articles_count': 1}])
+
+
+class ExportTests(ArticleTestCase):
+    def test_command_exports_incrementally(self):
+        LikeDislike.objects.create(user=self.reader, article=self.article, value=1)
+        second = LikeDislike.objects.create(user=self.author, article=self.article, value=-1)
+
+        out, err = StringIO(), StringIO()
+        call_command('export_data', 'votes', stdout=out, stderr=err)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        self.assertIn(f'--since-id {second.pk}', err.getvalue())
+
+        out = StringIO()
+        call_command('export_data', 'votes', '--since-id', str(second.pk - 1), stdout=out, stderr=StringIO())
+        self.assertEqual([json.loads(line)['value'] for line in out.getvalue().splitlines()], [-1])
+
+    def test_admin_stream_csv_and_access(self):
+        url = reverse('export_stream', args=['articles'])
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_superuser('root', password='pass12345'))
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,author_id'))
+        self.assertEqual(len(lines), 2)
+
+        response = self.client.get(url, {'since': self.article.updated_at.isoformat(), 'since_id': self.article.pk})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        for since in ('yesterday', '2024-02-30T00:00'):
+            self.assertEqual(self.client.get(url, {'since': since}).status_code, 400)
+
+    def test_counter_updates_move_the_article_watermark(self):
+        mark = export.watermark('articles', list(export.export_rows('articles'))[-1])
+        self.assertEqual(list(export.export_rows('articles', **mark)), [])
+        toggle_vote(self.reader, self.article, 1)
+        rows = list(export.export_rows('articles', **mark))
+        self.assertEqual([(r['id'], r['likes_count']) for r in rows], [(self.article.pk, 1)])
+
+    def test_incremental_article_export_reads_the_index_in_order(self):
+        mark = export.watermark('articles', list(export.export_rows('articles'))[-1])
+        with CaptureQueriesContext(connection) as queries:
+            list(export.export_rows('articles', **mark))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('article_updated_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class ImportJsonlTests(ArticleTestCase):
+    def write_jsonl(self, records):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(fd, 'w') as fh:
+            for record in records:
+                fh.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        return path
+
+    def test_import_resolves_refs_and_rebuilds_counters(self):
+        path = self.write_jsonl([
+            {'type': 'user', 'username': 'imported'},
+            {'type': 'category', 'name': 'Databases', 'slug': 'db'},
+            {'type': 'article', 'ref': 'src-1', 'title': 'Imported', 'author': 'imported',
+             'category': 'db', 'is_published': True},
+            {'type': 'vote', 'user': 'reader', 'article': 'src-1', 'value': 1},
+            {'type': 'vote', 'user': 'imported', 'article': 'src-1', 'value': -1},
+            {'type': 'rating', 'user': 'reader', 'article': self.article.pk, 'value': 4},
+            {'type': 'bookmark', 'user': 'reader', 'article': 'src-1'},
+            'not json',
+            {'type': 'vote', 'user': 'ghost', 'article': 'src-1', 'value': 1},
+        ])
+        err = StringIO()
+        call_command('import_jsonl', path, '--chunk-lines', '3', stdout=StringIO(), stderr=err)
+
+        imported = Article.objects.get(title='Imported')
+        self.assertEqual(imported.category.slug, 'db')
+        self.assertEqual((imported.likes_count, imported.dislikes_count), (1, 1))
+        self.assertEqual(Article.objects.get(pk=self.article.pk).rating_count, 1)
+        self.assertTrue(Bookmark.objects.filter(user=self.reader, article=imported).exists())
+        self.assertEqual(search_articles('imported')[0], [imported])
+        self.assertIn("unknown user 'ghost'", err.getvalue())
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_counts_only_new_rows_and_reports_missing_articles(self):
+        path = self.write_jsonl([
+            {'type': 'user', 'username': 'reader'},
+            {'type': 'user', 'username': 'newcomer'},
+            {'type': 'category', 'name': 'Backend', 'slug': 'backend'},
+            {'type': 'article', 'title': 'With image', 'author': 'newcomer', 'image': 'articles/imported.jpg'},
+            {'type': 'vote', 'user': 'reader', 'article': 999999, 'value': 1},
+        ])
+        out, err = StringIO(), StringIO()
+        call_command('import_jsonl', path, stdout=out, stderr=err)
+        self.assertIn('Import finished: 2 row(s), 1 error(s).', out.getvalue())
+        self.assertIn('line 5: unknown article 999999', err.getvalue())
+        article = Article.objects.get(title='With image')
+        job = Job.objects.get(unique_key=f'images:{article.pk}')
+        self.assertEqual((job.name, job.payload), ('build_image_variants', {'article_id': article.pk}))
+
+    def test_resume_skips_committed_chunks(self):
+        path = self.write_jsonl([
+            {'type': 'article', 'title': 'First', 'author': 'author'},
+            {'type': 'article', 'title': 'Second', 'author': 'author'},
+        ])
+        with open(path, 'rb') as fh:
+            offset = len(fh.readline())
+        with open(path + '.checkpoint', 'w') as fh:
+            json.dump({'offset': offset, 'line': 1, 'refs': {}, 'imported': 1, 'errors': 0, 'touched': []}, fh)
+
+        call_command('import_jsonl', path, '--resume', stdout=StringIO())
+        self.assertEqual(list(Article.objects.filter(title__in=['First', 'Second']).values_list('title', flat=True)),
+                         ['Second'])
+
+
+class SeedAndBenchmarkTests(ArticleTestCase):
+    def test_seed_is_skewed_and_counters_are_consistent(self):
+        counts = seed(users=30, articles=60, votes=400, ratings=150, bookmarks=80, random_seed=1)
+        self.assertEqual(counts['articles'], 60)
+        self.assertEqual(LikeDislike.objects.count(), counts['votes'])
+        likes = sorted(
+            (a.likes_count + a.dislikes_count for a in Article.objects.all()),
+            reverse=True,
+        )
+        self.assertGreater(likes[0], 4 * likes[len(likes) // 2])
+        top = Article.objects.order_by('-likes_count').first()
+        self.assertEqual(top.likes_count, LikeDislike.objects.filter(article=top, value=1).count())
+
+    def test_every_route_is_benchmarked_within_query_budget(self):
+        seed(users=20, articles=40, votes=200, ratings=80, bookmarks=40)
+        results, missing = run_benchmarks(iterations=2)
+        self.assertEqual(missing, [])
+        over = {
+            r.name: r.failures for r in results
+            if r.queries > r.budget['queries'] or any(status >= 400 for status in r.statuses)
+        }
+        self.assertEqual(over, {})
+
+
+@override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1, SQL_INSTRUMENTATION_DUPLICATE_THRESHOLD=3)
+class SQLInstrumentationTests(ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            make_article(self.author, self.category, title=f'N+1 {i}')
+
+    def run_middleware(self, get_response):
+        request = RequestFactory().get('/probe/')
+        request.user = User(username='staff', is_staff=True)
+        return SQLInstrumentationMiddleware(get_response)(request)
+
+    def test_lazy_fk_in_template_is_attributed_to_template_line(self):
+        template = engines['django'].from_string(
+            "{% for a in articles %}\n{{ a.author.username }}{% endfor %}"
+        )
+        response = self.run_middleware(
+            lambda request: HttpResponse(template.render({'articles': Article.objects.all()}))
+        )
+        self.assertEqual(response['X-SQL-Queries'], '5')
+        self.assertEqual(response['X-SQL-Repeated'], '1')
+        self.assertIn('x4 at <unknown source>:2', response['X-SQL-Worst-Repeated'])
+
+    def test_lazy_fk_in_code_is_attributed_to_caller_and_reported(self):
+        def view(request):
+            names = [a.category.name for a in Article.objects.all()]
+            return HttpResponse(', '.join(names))
+
+        response = self.run_middleware(view)
+        self.assertIn('articles/tests.py', response['X-SQL-Worst-Repeated'])
+        row = get_report()[0]
+        self.assertEqual((row['view'], row['requests'], row['max_queries']), ('/probe/', 1, 5))
+        self.assertEqual(row['repeated'][0]['count'], 4)
+
+    def test_query_origins_are_hidden_from_non_staff(self):
+        request = RequestFactory().get('/probe/')
+        request.user = self.reader
+        response = SQLInstrumentationMiddleware(
+            lambda request: HttpResponse([a.category.name for a in Article.objects.all()])
+        )(request)
+        self.assertEqual(response['X-SQL-Repeated'], '1')
+        self.assertNotIn('X-SQL-Worst-Repeated', response)
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_have_no_headers(self):
+        response = self.run_middleware(lambda request: HttpResponse(str(Article.objects.count())))
+        self.assertNotIn('X-SQL-Queries', response)
+        self.assertEqual(get_report(), [])
+
+    def test_report_page_is_staff_only(self):
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(reverse('sql_report')).status_code, 302)
+        User.objects.filter(pk=self.reader.pk).update(is_staff=True)
+        self.client.get(reverse('feed_all'))
+        response = self.client.get(reverse('sql_report'))
+        self.assertContains(response, 'feed_all')
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsTests(SharedCacheMixin, ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    def scrape(self, **extra):
+        extra.setdefault('HTTP_AUTHORIZATION', 'Bearer scrape-secret')
+        response = self.client.get(reverse('metrics'), **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_counted_per_url_name_with_latency_histogram(self):
+        self.client.get(reverse('feed_all'))
+        self.client.get(reverse('feed_all'))
+        self.client.get(reverse('login'))
+        body = self.scrape()
+        self.assertIn('habr_http_requests_total{method="GET",status="2xx",view="feed_all"} 2', body)
+        self.assertIn('habr_http_requests_total{method="GET",status="2xx",view="login"} 1', body)
+        self.assertIn('habr_http_request_duration_seconds_bucket{view="feed_all",le="+Inf"} 2', body)
+        self.assertIn('habr_http_request_duration_seconds_count{view="feed_all"} 2', body)
+        self.assertIn('habr_db_queries_total{view="feed_all"}', body)
+        # вторая анонимная выдача ленты берётся из страничного кэша
+        self.assertIn('habr_cache_requests_total{kind="page",result="hit"} 1', body)
+        self.assertIn('habr_cache_requests_total{kind="page",result="miss"} 1', body)
+
+    def test_committed_interaction_writes_are_counted(self):
+        self.client.force_login(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('article_like', args=[self.article.pk]))
+            self.client.post(reverse('article_rate', args=[self.article.pk, 5]))
+            self.client.post(
+                reverse('article_interactions_batch'), content_type='application/json',
+                data=json.dumps({'interactions': [{'type': 'dislike', 'article': self.article.pk}]}),
+            )
+        body = self.scrape()
+        self.assertIn('habr_interaction_writes_total{kind="vote",source="single"} 1', body)
+        self.assertIn('habr_interaction_writes_total{kind="rating",source="single"} 1', body)
+        self.assertIn('habr_interaction_writes_total{kind="vote",source="batch"} 1', body)
+
+    def test_metrics_of_all_worker_processes_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            metrics.inc('habr_interaction_writes_total', 2, kind='vote', source='single')
+            with open(os.path.join(directory, '99999.json'), 'w') as fh:
+                json.dump({
+                    'counters': [['habr_interaction_writes_total', [['kind', 'vote'], ['source', 'single']], 3]],
+                    'histograms': [],
+                }, fh)
+            body = metrics.render()
+            metrics.reset()
+        self.assertIn('habr_interaction_writes_total{kind="vote",source="single"} 5', body)
+
+    def test_endpoint_needs_the_token_or_staff(self):
+        url = reverse('metrics')
+        # адрес не в счёт: за обратным прокси все запросы приходят с 127.0.0.1
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        with self.settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+        self.scrape(REMOTE_ADDR='10.0.0.5')
+
+        User.objects.filter(pk=self.reader.pk).update(is_staff=True)
+        self.client.force_login(self.reader)
+        self.scrape(HTTP_AUTHORIZATION='')
+
+
+class ReplicaRoutingTests(SharedCacheMixin, SimpleTestCase):
+    """Primary and replica are two real SQLite files; the replica only changes on sync_replica."""
+    aliases = ('primary_file', 'replica_file')
+    # on_commit-хуки и поисковый индекс по-прежнему смотрят на соединение default
+    databases = {'default'}
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        base = dict(connections.settings['default'])
+        base.pop('TEST', None)
+        configured = connections.configure_settings({
+            'default': dict(base),
+            'primary_file': dict(base, NAME=os.path.join(self.tmpdir.name, 'primary.sqlite3')),
+            'replica_file': dict(base, NAME=os.path.join(self.tmpdir.name, 'replica.sqlite3'), READ_ONLY=True),
+        })
+        for alias in self.aliases:
+            connections.settings[alias] = configured[alias]
+        router = PrimaryReplicaRouter(primary='primary_file', replica='replica_file')
+        routing = override_settings(DATABASE_ROUTERS=[router])
+        routing.enable()
+        self.addCleanup(routing.disable)
+
+        call_command('migrate', database='primary_file', verbosity=0)
+        author = User.objects.create_user('replica-author', password='pass12345')
+        self.article = make_article(author, Category.objects.first())
+        call_command('sync_replica', primary='primary_file', replica='replica_file', stdout=StringIO())
+
+    def tearDown(self):
+        for alias in self.aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        self.tmpdir.cleanup()
+
+    def request(self, method, write=False, cookies=None):
+        def view(request):
+            if write:
+                Article.objects.filter(pk=self.article.pk).update(likes_count=F('likes_count') + 1)
+            article = Article.objects.get(pk=self.article.pk)
+            return HttpResponse(f'{article._state.db}:{article.likes_count}')
+
+        request = getattr(RequestFactory(), method)('/probe/')
+        request.COOKIES.update(cookies or {})
+        return PrimaryPinMiddleware(view)(request)
+
+    def test_pragmas_are_applied(self):
+        with connections['primary_file'].cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+        with connections['replica_file'].cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA query_only').fetchone()[0], 1)
+
+    def test_safe_requests_read_the_replica_until_the_visitor_writes(self):
+        Article.objects.filter(pk=self.article.pk).update(likes_count=5)  # ещё не реплицировано
+        self.assertEqual(self.request('get').content, b'replica_file:0')
+        self.assertEqual(Article.objects.get(pk=self.article.pk).likes_count, 5)  # вне запроса — primary
+
+        response = self.request('post', write=True)
+        self.assertEqual(response.content, b'primary_file:6')
+        pinned = {PIN_COOKIE: response.cookies[PIN_COOKIE].value}
+        self.assertEqual(self.request('get', cookies=pinned).content, b'primary_file:6')
+        self.assertEqual(self.request('get').content, b'replica_file:0')
+
+    def test_reads_after_a_write_in_the_same_request_use_the_primary(self):
+        response = self.request('get', write=True)
+        self.assertEqual(response.content, b'primary_file:1')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_session_writes_do_not_pin(self):
+        def view(request):
+            Session.objects.create(session_key='probe', session_data='', expire_date=timezone.now())
+            return HttpResponse(Article.objects.get(pk=self.article.pk)._state.db)
+
+        response = PrimaryPinMiddleware(view)(RequestFactory().get('/probe/'))
+        self.assertEqual(response.content, b'replica_file')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_page_cache_fills_from_the_primary(self):
+        @anonymous_page_cache(lambda request: ['replica-probe'])
+        def view(request):
+            return HttpResponse(Article.objects.get(pk=self.article.pk).likes_count)
+
+        def get(cookies=None):
+            request = RequestFactory().get('/cached/')
+            request.user = AnonymousUser()
+            request.COOKIES.update(cookies or {})
+            return PrimaryPinMiddleware(view)(request)
+
+        cache.clear()
+        Article.objects.filter(pk=self.article.pk).update(likes_count=3)  # реплика отстаёт
+        self.assertEqual(get().content, b'3')
+        pinned = get(cookies={PIN_COOKIE: f'{time.time() + 60:.0f}'})
+        self.assertFalse(pinned.has_header('ETag'))
+
+
+def make_upload(width, height, name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageVariantTests(ArticleTestCase):
+    def test_upload_queues_variant_job(self):
+        article = make_article(self.author, self.category, image=make_upload(1600, 900))
+        self.assertEqual(article.image_variants, {})
+        self.assertEqual(jobs.run_pending()[1], 0)
+        article.refresh_from_db()
+        widths = article.image_variants['widths']
+        self.assertEqual(sorted(widths, key=int), ['320', '640', '1024'])
+        self.assertEqual(article.image_variants['source'], article.image.name)
+        name = widths['320'][len(settings.MEDIA_URL):]
+        with default_storage.open(name) as fh, Image.open(fh) as variant:
+            self.assertEqual(variant.size, (320, 180))
+
+    def test_feed_card_uses_srcset_and_lazy_loading(self):
+        article = make_article(self.author, self.category, image=make_upload(800, 400), title='Pictured')
+        build_variants(article)
+        response = self.client.get(reverse('feed_all'))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, f"{article.image_variants['widths']['800']} 800w")
+        self.assertContains(response, f'src="{article.image_variants["widths"]["640"]}"')
+
+    def test_unreadable_image_falls_back_to_original(self):
+        variants = build_variants(self.article)
+        self.assertEqual(variants, {'source': self.article.image.name, 'widths': {}})
+        response = self.client.get(reverse('feed_all'))
+        self.assertContains(response, f'src="{self.article.image.url}"')
+        self.assertNotContains(response, 'srcset=')
+
+
+class JobQueueTests(ArticleTestCase):
+    def setUp(self):
+        super().setUp()
+        Job.objects.all().delete()
+        self.calls = []
+        jobs.task('test_job')(self.flaky_task)
+        self.addCleanup(jobs.TASKS.pop, 'test_job')
+
+    def flaky_task(self, fail_times=0):
+        self.calls.append(fail_times)
+        if len(self.calls) <= fail_times:
+            raise RuntimeError('boom')
+
+    def test_failed_job_is_retried_with_backoff_then_succeeds(self):
+        job = jobs.enqueue('test_job', {'fail_times': 1})
+        self.assertEqual(jobs.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(jobs.run_pending(), (0, 0))  # ещё рано
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.DONE, 2))
+
+    def test_job_fails_permanently_after_max_attempts(self):
+        job = jobs.enqueue('test_job', {'fail_times': 5}, max_attempts=2)
+        for _ in range(2):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, len(self.calls)), (Job.Status.FAILED, 2, 2))
+
+    def test_unique_key_and_single_claim(self):
+        first = jobs.enqueue('test_job', unique_key='same')
+        self.assertIsNone(jobs.enqueue('test_job', unique_key='same'))
+        self.assertEqual(jobs.claim('worker-a'), [first])
+        self.assertEqual(jobs.claim('worker-b'), [])
+        # воркер упал посреди job — через LOCK_TIMEOUT job возвращается в очередь
+        Job.objects.update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT * 2)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual([j.locked_by for j in jobs.claim('worker-b')], ['worker-b'])
+
+    def test_run_worker_burst_drains_queue(self):
+        for _ in range(3):
+            jobs.enqueue('test_job')
+        call_command('run_worker', '--burst', '--threads', '1', stdout=StringIO())
+        self.assertEqual(len(self.calls), 3)
+        self.assertFalse(Job.objects.exclude(status=Job.Status.DONE).exists())
+
+    def test_admin_recount_is_queued_not_inline(self):
+        admin = User.objects.create_superuser('boss', password='pass12345')
+        self.client.force_login(admin)
+        Article.objects.filter(pk=self.article.pk).update(likes_count=99)
+        self.client.post(reverse('admin:articles_article_changelist'), {
+            'action': 'recount_articles', '_selected_action': [self.article.pk],
+        })
+        self.assertEqual(Article.objects.get(pk=self.article.pk).likes_count, 99)
+        jobs.run_pending()
+        self.assertEqual(Article.objects.get(pk=self.article.pk).likes_count, 0)
+
+
+class RenderedContentTests(ArticleTestCase):
+    def test_markdown_is_rendered_and_sanitized_on_save(self):
+        article = make_article(
+            self.author, self.category,
+            content='# Title\n\nSome **bold** [link](javascript:alert(1)) text.\n\n<script>alert(1)</script>',
+        )
+        self.assertIn('<h1>Title</h1>', article.content_html)
+        self.assertIn('<strong>bold</strong>', article.content_html)
+        self.assertNotIn('<script', article.content_html)
+        self.assertNotIn('javascript:', article.content_html)
+        self.assertTrue(article.excerpt.startswith('Title Some bold link text.'))
+
+        article.content = 'Changed'
+        article.save(update_fields=['content'])
+        article.refresh_from_db()
+        self.assertEqual((article.content_html, article.excerpt), ('<p>Changed</p>', 'Changed'))
+
+    def test_feeds_do_not_load_content(self):
+        make_article(self.author, self.category, content='x' * 5000)
+        self.client.force_login(self.reader)
+        for url in [reverse('feed_all'), reverse('feed_popular'), reverse('feed_by_category', args=['backend'])]:
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(url)
+            article_queries = [q['sql'] for q in ctx.captured_queries if 'FROM "articles_article"' in q['sql']]
+            self.assertTrue(article_queries)
+            for sql in article_queries:
+                self.assertNotIn('"articles_article"."content"', sql)
+                self.assertNotIn('"articles_article"."content_html"', sql)
+
+    def test_detail_renders_stored_html(self):
+        article = make_article(self.author, self.category, content='Hello *world*')
+        response = self.client.get(reverse('article_detail', args=[article.pk]))
+        self.assertContains(response, '<p>Hello <em>world</em></p>', html=True)
+
+
+class RecommendationTests(ArticleTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.frontend = Category.objects.get_or_create(slug='frontend', defaults={'name': 'Frontend'})[0]
+        cls.other_author = User.objects.create_user('other', password='pass12345')
+        cls.liked = make_article(cls.other_author, cls.frontend, title='Liked')
+        cls.same_category = make_article(cls.author, cls.frontend, title='Same category')
+        cls.same_author = make_article(cls.other_author, cls.category, title='Same author')
+        cls.unrelated = make_article(cls.author, cls.category, title='Unrelated')
+
+    def test_affinity_ranks_liked_category_and_author_first(self):
+        LikeDislike.objects.create(user=self.reader, article=self.liked, value=1)
+        Rating.objects.create(user=self.reader, article=self.article, value=1)
+        ids = recommendations.score_users([self.reader.pk])[self.reader.pk]
+        self.assertNotIn(self.liked.pk, ids)
+        self.assertEqual(ids[0], self.same_author.pk)
+        self.assertEqual(ids[-1], self.unrelated.pk)
+        self.assertLess(ids.index(self.same_category.pk), ids.index(self.unrelated.pk))
+
+    def test_batch_matches_single_and_excludes_own_articles(self):
+        Bookmark.objects.create(user=self.reader, article=self.liked)
+        Bookmark.objects.create(user=self.author, article=self.liked)
+        batch = recommendations.score_users([self.author.pk, self.reader.pk, self.other_author.pk])
+        self.assertEqual(batch[self.reader.pk], recommendations.score_users([self.reader.pk])[self.reader.pk])
+        self.assertFalse({self.article.pk, self.same_category.pk, self.unrelated.pk} & set(batch[self.author.pk]))
+        self.assertEqual(batch[self.other_author.pk], [])
+
+    def test_feed_is_cached_and_falls_back_to_popular(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('feed_for_you'))
+        self.assertTrue(response.context['cold_start'])
+        self.assertEqual(len(response.context['articles']), 5)
+
+        LikeDislike.objects.create(user=self.reader, article=self.liked, value=1)
+        cache.delete(recommendations.cache_key(self.reader.pk))
+        response = self.client.get(reverse('feed_for_you'))
+        self.assertFalse(response.context['cold_start'])
+        self.assertEqual(response.context['articles'].object_list[0], self.same_author)
+        with self.assertNumQueries(4):  # сессия, пользователь, статьи страницы, отметки читателя
+            self.client.get(reverse('feed_for_you'))
+
+    def test_build_command_needs_a_shared_cache(self):
+        LikeDislike.objects.create(user=self.reader, article=self.liked, value=1)
+        with self.assertRaises(CommandError):
+            call_command('build_recommendations', stdout=StringIO())
+
+        cache_dir = tempfile.mkdtemp(prefix='habr-cache-')
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir}}
+        with override_settings(CACHES=shared):
+            call_command('build_recommendations', stdout=StringIO())
+            self.assertEqual(cache.get(recommendations.cache_key(self.reader.pk))[0], self.same_author.pk)
+
+
+class RelatedArticleTests(ArticleTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.frontend = Category.objects.get_or_create(slug='frontend', defaults={'name': 'Frontend'})[0]
+        cls.cache_a = make_article(cls.author, cls.category, title='Django cache tuning',
+                                   content='cache invalidation versioned fragments django')
+        cls.cache_b = make_article(cls.author, cls.category, title='Cache warming in django',
+                                   content='cache warming fragments versioned django')
+        cls.css = make_article(cls.author, cls.frontend, title='CSS grid', content='layout grid flexbox')
+        cls.css_b = make_article(cls.author, cls.frontend, title='Flexbox', content='layout flexbox columns')
+
+    def neighbours(self, article):
+        return list(RelatedArticle.objects.filter(article=article).order_by('rank').values_list('related_id', flat=True))
+
+    def test_content_category_and_co_likes_drive_neighbours(self):
+        self.assertEqual(related.refresh(), 5)
+        self.assertEqual(self.neighbours(self.cache_a)[0], self.cache_b.pk)
+        self.assertEqual(self.neighbours(self.css)[0], self.css_b.pk)
+        self.assertNotIn(self.cache_a.pk, self.neighbours(self.cache_a))
+
+        # общие лайки тянут статьи из разных категорий друг к другу
+        for user in (self.reader, self.author):
+            toggle_vote(user, self.cache_a, 1)
+            toggle_vote(user, self.css, 1)
+        related.refresh()
+        self.assertIn(self.css.pk, self.neighbours(self.cache_a))
+        self.assertNotIn(self.css_b.pk, self.neighbours(self.cache_a))
+
+    def test_refresh_is_incremental(self):
+        related.refresh()
+        self.assertEqual(related.refresh(), 0)
+        Bookmark.objects.create(user=self.reader, article=self.css)
+        rebuilt = related.refresh()
+        self.assertGreaterEqual(rebuilt, 1)
+        self.assertLess(rebuilt, 5)
+        Article.objects.filter(pk=self.css_b.pk).update(is_published=False)
+        related.refresh()
+        self.assertFalse(RelatedArticle.objects.filter(article=self.css_b).exists())
+
+    def test_detail_shows_related_with_one_query(self):
+        related.refresh()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('article_detail', args=[self.cache_a.pk]))
+        self.assertContains(response, 'Related articles')
+        self.assertEqual(response.context['related_articles'][0], self.cache_b)
+        related_queries = [q for q in ctx.captured_queries if 'articles_relatedarticle' in q['sql']]
+        self.assertEqual(len(related_queries), 1)
+
+
+class AuthorStatsTests(ArticleTestCase):
+    def stats(self, user):
+        row = AuthorStats.objects.filter(author=user).first()
+        return row and (row.published_count, row.total_likes, row.rating_sum, row.rating_count)
+
+    def test_write_paths_keep_stats_current(self):
+        self.assertEqual(self.stats(self.author), (1, 0, 0, 0))
+        draft = make_article(self.author, self.category, is_published=False)
+        toggle_vote(self.reader, self.article, 1)
+        toggle_vote(self.author, draft, 1)  # неопубликованные не считаются
+        rate_article(self.reader, self.article, 4)
+        rate_article(self.reader, self.article, 2)
+        self.assertEqual(self.stats(self.author), (1, 1, 2, 1))
+
+        draft.is_published = True
+        draft.save(update_fields=['is_published'])
+        self.assertEqual(self.stats(self.author), (2, 2, 2, 1))
+        self.client.force_login(self.reader)
+        self.client.post(reverse('article_interactions_batch'), json.dumps({'interactions': [
+            {'type': 'unvote', 'article': self.article.pk}, {'type': 'rate', 'article': draft.pk, 'value': 5},
+        ]}), content_type='application/json')
+        self.assertEqual(self.stats(self.author), (2, 1, 7, 2))
+
+        incremental = self.stats(self.author)
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author), incremental)
+
+        self.article.delete()
+        draft.delete()
+        self.assertIsNone(self.stats(self.author))
+
+    def test_feed_authors_is_paginated_from_stats(self):
+        for i in range(PAGE_SIZE + 2):
+            make_article(User.objects.create(username=f'writer{i}'), self.category)
+        with self.assertNumQueries(1):  # AuthorStats и пользователи одной выборкой
+            response = self.client.get(reverse('feed_authors'))
+        self.assertEqual(len(response.context['authors']), PAGE_SIZE)
+        self.assertTrue(response.context['page'].has_next)
+        response = self.client.get(reverse('feed_authors'), {'cursor': response.context['page'].next_cursor})
+        self.assertEqual(len(response.context['authors']), 3)
+
+    def test_author_page(self):
+        toggle_vote(self.reader, self.article, 1)
+        response = self.client.get(reverse('author_detail', args=[self.author.username]))
+        self.assertContains(response, '👍 1 likes')
+        self.assertEqual(list(response.context['articles']), [self.article])
+        self.assertEqual(self.client.get(reverse('author_detail', args=['nobody'])).status_code, 404)
+
+
+class ModerationTests(ArticleTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.moderator = User.objects.create_user('moder', password='pass12345', role=User.Roles.ADMIN)
+        cls.frontend = Category.objects.get_or_create(slug='frontend', defaults={'name': 'Frontend'})[0]
+        cls.drafts = [
+            make_article(cls.author, cls.category if i % 3 else cls.frontend, title=f'Draft {i}', is_published=False)
+            for i in range(PAGE_SIZE + 5)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.moderator)
+
+    def test_queue_is_paginated_filtered_and_counted(self):
+        response = self.client.get(reverse('moderation_queue'))
+        self.assertEqual([a.pk for a in response.context['articles']], [a.pk for a in self.drafts[:PAGE_SIZE]])
+        self.assertEqual(response.context['total_pending'], PAGE_SIZE + 5)
+        self.assertEqual(dict(response.context['category_counts']), {self.category: 16, self.frontend: 9})
+
+        response = self.client.get(reverse('moderation_queue'), {'cursor': response.context['page'].next_cursor})
+        self.assertEqual(len(response.context['articles']), 5)
+        response = self.client.get(reverse('moderation_queue'), {'category': 'frontend'})
+        self.assertEqual(len(response.context['articles']), 9)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('moderation_queue'))
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])  # счётчики из кэша
+
+    def test_pending_queries_use_partial_indexes(self):
+        sql, params = Article.objects.pending().filter(category=self.category).order_by('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('article_pending_category_idx', plan)
+
+    def test_bulk_approve_and_reject(self):
+        feed_url = reverse('feed_all')
+        self.client.logout()
+        self.client.get(feed_url)  # лента попадает в постраничный кэш
+        self.client.force_login(self.moderator)
+        moderation.pending_counts()
+        approve, reject = self.drafts[:3], self.drafts[3:5]
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('moderation_bulk'), {'action': 'approve', 'articles': [a.pk for a in approve]})
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "articles_article"')]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('moderation_bulk'), {'action': 'reject', 'articles': [a.pk for a in reject + approve]})
+
+        self.assertEqual(Article.objects.filter(pk__in=[a.pk for a in approve], is_published=True).count(), 3)
+        self.assertEqual(Article.objects.filter(pk__in=[a.pk for a in reject], is_rejected=True).count(), 2)
+        self.assertEqual(AuthorStats.objects.get(author=self.author).published_count, 4)
+        self.assertEqual(sum(moderation.pending_counts().values()), PAGE_SIZE)
+
+        self.client.logout()
+        self.assertContains(self.client.get(feed_url), 'Draft 0')
+
+    def test_single_approve_requires_post_and_moderator(self):
+        url = reverse('moderation_approve', args=[self.drafts[0].pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.force_login(self.reader)
+        self.client.post(url)
+        self.assertFalse(Article.objects.get(pk=self.drafts[0].pk).is_published)
+        self.client.force_login(self.moderator)
+        self.client.post(url)
+        self.assertTrue(Article.objects.get(pk=self.drafts[0].pk).is_published)
+
+
+class InteractionOverlayTests(ArticleTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.others = [make_article(cls.author, cls.category, title=f'Other {i}') for i in range(3)]
+        LikeDislike.objects.create(user=cls.reader, article=cls.article, value=1)
+        LikeDislike.objects.create(user=cls.reader, article=cls.others[0], value=-1)
+        Bookmark.objects.create(user=cls.reader, article=cls.article)
+        Rating.objects.create(user=cls.reader, article=cls.others[1], value=4)
+        LikeDislike.objects.create(user=cls.author, article=cls.others[2], value=1)
+
+    def test_one_query_per_page(self):
+        ids = [self.article.pk] + [a.pk for a in self.others]
+        with self.assertNumQueries(1):
+            result = overlay.interactions_for(self.reader, ids)
+        self.assertEqual(result, {
+            self.article.pk: overlay.Interaction(vote=1, bookmarked=True),
+            self.others[0].pk: overlay.Interaction(vote=-1),
+            self.others[1].pk: overlay.Interaction(rating=4),
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(overlay.interactions_for(AnonymousUser(), ids), {})
+
+    def test_feed_cards_show_overlay_outside_fragment_cache(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('feed_all'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('feed_all'))
+        self.assertEqual(len([q for q in ctx.captured_queries if 'UNION ALL' in q['sql']]), 1)
+        self.assertContains(response, 'You liked this', count=1)
+        self.assertContains(response, 'You disliked this', count=1)
+        self.assertContains(response, 'Your rating: 4★', count=1)
+
+        # кэшированные карточки не уносят отметки читателя к другим пользователям
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('feed_all'))
+        self.assertContains(response, 'You liked this', count=1)
+        self.assertNotContains(response, 'You disliked this')
+
+    def test_detail_uses_overlay(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('article_detail', args=[self.article.pk]))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('article_detail', args=[self.article.pk]))
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "articles_bookmark"' in q['sql'] and 'UNION' not in q['sql']])
+        self.assertTrue(response.context['is_bookmarked'])
+        self.assertTrue(response.context['interaction'].liked)
@@ -1,18 +1,24 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.feed_all, name='feed_all'),
     path('popular/', views.feed_popular, name='feed_popular'),
     path('category/<slug:slug>/', views.feed_by_category, name='feed_by_category'),
+    path('search/', views.article_search, name='article_search'),
     path('authors/', views.feed_authors, name='feed_authors'),
+    path('authors/<str:username>/', views.author_detail, name='author_detail'),
     path('favorites/', views.feed_favorites, name='feed_favorites'),
+    path('for-you/', views.feed_for_you, name='feed_for_you'),
     path('my/', views.feed_my_articles, name='feed_my_articles'),
     path('category/<slug:slug>/', views.feed_by_category, name='feed_by_category'),
 
     path('moderation/', views.moderation_queue, name='moderation_queue'),
+    path('moderation/bulk/', views.moderation_bulk, name='moderation_bulk'),
     path('moderation/<int:pk>/approve/', views.moderation_approve, name='moderation_approve'),
 
+    path('export/<str:name>/', views.export_stream, name='export_stream'),
+
     path('create/', views.article_create, name='article_create'),
     path('<int:pk>/', views.article_detail, name='article_detail'),
     path('<int:pk>/edit/', views.article_update, name='article_update'),
@@ -22,9 +28,19 @@ urlpatterns = [
     path('<int:pk>/dislike/', views.article_dislike, name='article_dislike'),
     path('<int:pk>/bookmark/', views.article_bookmark_toggle, name='article_bookmark_toggle'),
     path('<int:pk>/rate/<int:value>/', views.article_rate, name='article_rate'),
+    path('interactions/batch/', views.article_interactions_batch, name='article_interactions_batch'),
     path('<int:pk>/confirm/', views.article_confirm, name='article_confirm'),
     path('articles/<int:pk>/edit/', views.article_update, name='article_update'),
 
+    # async-версии горячих эндпоинтов — для запуска через habr/asgi.py
+    path('async/', async_views.feed_all, name='feed_all_async'),
+    path('async/popular/', async_views.feed_popular, name='feed_popular_async'),
+    path('async/category/<slug:slug>/', async_views.feed_by_category, name='feed_by_category_async'),
+    path('async/<int:pk>/like/', async_views.article_like, name='article_like_async'),
+    path('async/<int:pk>/dislike/', async_views.article_dislike, name='article_dislike_async'),
+    path('async/<int:pk>/bookmark/', async_views.article_bookmark_toggle, name='article_bookmark_toggle_async'),
+    path('async/<int:pk>/rate/<int:value>/', async_views.article_rate, name='article_rate_async'),
+
 
 
 
@@ -1,109 +1,150 @@
+import json
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Avg, Count
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.http import require_POST
-from .models import Article, Category, LikeDislike, Bookmark, Rating
-
+from . import export, instrumentation, metrics, moderation, overlay, recommendations, related
+from .cache import FEEDS_SCOPE, anonymous_page_cache, article_scope, category_scope
+from .models import Article, AuthorStats, Category, Bookmark
+from .pagination import AUTHOR_ORDERING, PAGE_SIZE, POPULAR_ORDERING, paginate_by_pk, paginate_ids, paginate_keyset
+from .search import search_articles
+from .services import MAX_BATCH_SIZE, apply_interactions, rate_article, toggle_vote
 
+User = get_user_model()
 
 
-def feed_all(request):
 
-    articles = Article.objects.filter(is_published=True).order_by('-created_at')
 
-    for article in articles:
-        likes = article.votes.filter(value=1).count()
-        dislikes = article.votes.filter(value=-1).count()
-        total = likes + dislikes
-        article.rating_percent = round((likes / total * 100), 1) if total > 0 else 0
+@anonymous_page_cache(lambda request: [FEEDS_SCOPE])
+def feed_all(request):
 
-    return render(request, 'articles/index.html', {'articles': articles})
+    articles = Article.objects.filter(is_published=True).for_list()
+    page = paginate_keyset(articles, request.GET.get('cursor'))
+    overlay.annotate(request.user, page)
+    return render(request, 'articles/index.html', {'articles': page, 'page': page})
 
 
 
+@anonymous_page_cache(lambda request: [FEEDS_SCOPE])
 def feed_popular(request):
 
-    articles = Article.objects.filter(is_published=True).order_by('-rating', '-created_at')
-
-
-    for article in articles:
-        likes = article.votes.filter(value=1).count()
-        dislikes = article.votes.filter(value=-1).count()
-        total = likes + dislikes
-        article.rating_percent = round((likes / total * 100), 1) if total > 0 else 0
-
-    # сортируем именно по вычисленному проценту (если нужно)
-    articles = sorted(articles, key=lambda a: a.rating_percent, reverse=True)
-
-    return render(request, 'articles/feed_popular.html', {'articles': articles})
+    articles = Article.objects.filter(is_published=True).for_list()
+    page = paginate_keyset(articles, request.GET.get('cursor'), ordering=POPULAR_ORDERING)
+    overlay.annotate(request.user, page)
+    return render(request, 'articles/feed_popular.html', {'articles': page, 'page': page})
 
 
 
+@anonymous_page_cache(lambda request, slug: [category_scope(slug)])
 def feed_by_category(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    articles = category.articles.filter(is_published=True).order_by('-created_at')
-    for article in articles:
-        likes = article.votes.filter(value=1).count()
-        dislikes = article.votes.filter(value=-1).count()
-        total = likes + dislikes
-        article.rating_percent = round((likes / total * 100), 1) if total > 0 else 0
-    return render(request, 'articles/feed_category.html', {'category': category, 'articles': articles})
+    articles = category.articles.filter(is_published=True).for_list()
+    page = paginate_keyset(articles, request.GET.get('cursor'))
+    overlay.annotate(request.user, page)
+    return render(request, 'articles/feed_category.html', {'category': category, 'articles': page, 'page': page})
+
+
+
+def article_search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    articles, has_next = search_articles(query, page=page, per_page=PAGE_SIZE)
+    overlay.annotate(request.user, articles)
+    return render(request, 'articles/search.html', {
+        'query': query,
+        'articles': articles,
+        'page_number': page,
+        'has_next': has_next,
+    })
 
 
 
+@anonymous_page_cache(lambda request: [FEEDS_SCOPE])
 def feed_authors(request):
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    authors = (
-        User.objects
-        .filter(articles__is_published=True)
-        .annotate(total_articles=Count('articles'))
-        .order_by('-total_articles', 'username')
-    )
-    return render(request, 'articles/feed_authors.html', {'authors': authors})
+    # итоги берутся из AuthorStats, а не Count() по статьям на каждый запрос
+    authors = AuthorStats.objects.filter(published_count__gt=0).select_related('author')
+    page = paginate_keyset(authors, request.GET.get('cursor'), ordering=AUTHOR_ORDERING)
+    return render(request, 'articles/feed_authors.html', {'authors': page, 'page': page})
+
+
+@anonymous_page_cache(lambda request, username: [FEEDS_SCOPE])
+def author_detail(request, username):
+    author = get_object_or_404(User.objects.select_related('author_stats'), username=username)
+    articles = Article.objects.filter(author=author, is_published=True).for_list()
+    page = paginate_keyset(articles, request.GET.get('cursor'))
+    overlay.annotate(request.user, page)
+    return render(request, 'articles/author_detail.html', {
+        'author': author,
+        'stats': getattr(author, 'author_stats', None),
+        'articles': page,
+        'page': page,
+    })
 
 
 @login_required
 def feed_favorites(request):
-    articles = Article.objects.filter(bookmarks__user=request.user).order_by('-created_at')
-    return render(request, 'articles/feed_favorites.html', {'articles': articles})
+    articles = Article.objects.filter(bookmarks__user=request.user).for_list()
+    page = paginate_keyset(articles, request.GET.get('cursor'))
+    overlay.annotate(request.user, page)
+    return render(request, 'articles/feed_favorites.html', {'articles': page, 'page': page})
+
+
+@login_required
+def feed_for_you(request):
+    ids = recommendations.for_user(request.user)
+    articles = Article.objects.filter(is_published=True).for_list()
+    if ids:
+        page = paginate_ids(articles, ids, request.GET.get('cursor'))
+    else:
+        # нет истории — показываем популярное
+        page = paginate_keyset(articles, request.GET.get('cursor'), ordering=POPULAR_ORDERING)
+    overlay.annotate(request.user, page)
+    return render(request, 'articles/feed_for_you.html', {
+        'articles': page, 'page': page, 'cold_start': not ids,
+    })
 
 
 @login_required
 def feed_my_articles(request):
 
-    articles = Article.objects.filter(author=request.user).order_by('-created_at')
-    return render(request, 'articles/feed_my.html', {'articles': articles})
+    articles = Article.objects.filter(author=request.user).for_list()
+    page = paginate_keyset(articles, request.GET.get('cursor'))
+    overlay.annotate(request.user, page)
+    return render(request, 'articles/feed_my.html', {'articles': page, 'page': page})
 
 
 
 
+@anonymous_page_cache(lambda request, pk: [article_scope(pk)])
 def article_detail(request, pk):
-    article = get_object_or_404(Article, pk=pk)
+    article = get_object_or_404(Article.objects.select_related('author', 'category').defer('content'), pk=pk)
     can_view = article.is_published or request.user.is_authenticated and (
         request.user == article.author or request.user.can_manage_articles()
     )
     if not can_view:
         return redirect('feed_all')
 
-    likes = article.votes.filter(value=1).count()
-    dislikes = article.votes.filter(value=-1).count()
-    total = likes + dislikes
-    rating_percent = round((likes / total) * 100, 1) if total > 0 else 0
-
-    is_bookmarked = False
-    if request.user.is_authenticated:
-        is_bookmarked = Bookmark.objects.filter(user=request.user, article=article).exists()
+    interaction = overlay.interactions_for(request.user, [article.pk]).get(article.pk, overlay.Interaction())
 
     return render(request, 'articles/article_detail.html', {
         'a': article,
-        'likes': likes,
-        'dislikes': dislikes,
-        'is_bookmarked': is_bookmarked,
-        'rating_percent': rating_percent,
-        'is_approved': article.is_published
+        'likes': article.likes_count,
+        'dislikes': article.dislikes_count,
+        'is_bookmarked': interaction.bookmarked,
+        'interaction': interaction,
+        'rating_percent': article.rating_percent,
+        'is_approved': article.is_published,
+        'related_articles': related.related_for(article),
     })
 
 
@@ -151,6 +192,7 @@ def article_update(request, pk):
 
         if not request.user.can_manage_articles():
             article.is_published = False
+            article.is_rejected = False  # правка после отказа — снова в очередь
 
         article.save()
         messages.info(request, "Article updated and sent for approval.")
@@ -179,38 +221,24 @@ def article_delete(request, pk):
 @require_POST
 def article_like(request, pk):
     article = get_object_or_404(Article, pk=pk)
-    existing_vote = LikeDislike.objects.filter(user=request.user, article=article).first()
-
-    if existing_vote and existing_vote.value == 1:
-        existing_vote.delete()
-    else:
-        LikeDislike.objects.update_or_create(user=request.user, article=article, defaults={'value': 1})
-
-    likes = article.votes.filter(value=1).count()
-    dislikes = article.votes.filter(value=-1).count()
-    total = likes + dislikes
-    rating_percent = round((likes / total) * 100, 1) if total > 0 else 0
-
-    return JsonResponse({'likes': likes, 'dislikes': dislikes, 'rating_percent': rating_percent})
+    toggle_vote(request.user, article, 1)
+    return JsonResponse({
+        'likes': article.likes_count,
+        'dislikes': article.dislikes_count,
+        'rating_percent': article.rating_percent,
+    })
 
 
 @login_required
 @require_POST
 def article_dislike(request, pk):
     article = get_object_or_404(Article, pk=pk)
-    existing_vote = LikeDislike.objects.filter(user=request.user, article=article).first()
-
-    if existing_vote and existing_vote.value == -1:
-        existing_vote.delete()
-    else:
-        LikeDislike.objects.update_or_create(user=request.user, article=article, defaults={'value': -1})
-
-    likes = article.votes.filter(value=1).count()
-    dislikes = article.votes.filter(value=-1).count()
-    total = likes + dislikes
-    rating_percent = round((likes / total) * 100, 1) if total > 0 else 0
-
-    return JsonResponse({'likes': likes, 'dislikes': dislikes, 'rating_percent': rating_percent})
+    toggle_vote(request.user, article, -1)
+    return JsonResponse({
+        'likes': article.likes_count,
+        'dislikes': article.dislikes_count,
+        'rating_percent': article.rating_percent,
+    })
 
 
 @login_required
@@ -224,6 +252,7 @@ def article_bookmark_toggle(request, pk):
         bookmarked = False
     else:
         bookmarked = True
+    metrics.inc('habr_interaction_writes_total', kind='bookmark', source='single')
 
     if request.META.get('HTTP_REFERER', '').endswith('/favorites/'):
         return redirect('feed_favorites')
@@ -235,12 +264,25 @@ def article_bookmark_toggle(request, pk):
 @require_POST
 def article_rate(request, pk, value):
     article = get_object_or_404(Article, pk=pk)
-    value = max(1, min(5, int(value)))
-    Rating.objects.update_or_create(user=request.user, article=article, defaults={'value': value})
-    avg = article.ratings.aggregate(v=Avg('value'))['v'] or 0
-    article.rating = round(float(avg), 2)
-    article.save(update_fields=['rating'])
-    return JsonResponse({'rating': article.rating})
+    rate_article(request.user, article, value)
+    return JsonResponse({'rating': article.rating, 'rating_count': article.rating_count})
+
+
+
+@login_required
+@require_POST
+def article_interactions_batch(request):
+    try:
+        items = json.loads(request.body)['interactions']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON body {"interactions": [...]}.'}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({'error': '"interactions" must be a list.'}, status=400)
+    if len(items) > MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'At most {MAX_BATCH_SIZE} interactions per request.'}, status=400)
+
+    results, articles = apply_interactions(request.user, items)
+    return JsonResponse({'results': results, 'articles': articles})
 
 
 
@@ -248,18 +290,50 @@ def article_rate(request, pk, value):
 def moderation_queue(request):
     if not request.user.can_manage_articles():
         return redirect('feed_all')
-    articles = Article.objects.filter(is_published=False).order_by('created_at')
-    return render(request, 'articles/mod_queue.html', {'articles': articles})
+    filters = {
+        'category': request.GET.get('category', '').strip(),
+        'author': request.GET.get('author', '').strip(),
+    }
+    articles = Article.objects.pending().select_related('author', 'category').defer('content', 'content_html')
+    if filters['category']:
+        articles = articles.filter(category__slug=filters['category'])
+    if filters['author']:
+        articles = articles.filter(author__username=filters['author'])
+    page = paginate_by_pk(articles, request.GET.get('cursor'))
+    return render(request, 'articles/mod_queue.html', {
+        'articles': page,
+        'page': page,
+        'filters': filters,
+        'category_counts': moderation.category_counts(),
+        'total_pending': sum(moderation.pending_counts().values()),
+    })
+
+
+@login_required
+@require_POST
+def moderation_bulk(request):
+    if not request.user.can_manage_articles():
+        return redirect('feed_all')
+    action = request.POST.get('action')
+    ids = [int(pk) for pk in request.POST.getlist('articles') if pk.isdigit()]
+    if action not in ('approve', 'reject') or not ids:
+        messages.error(request, "Select articles and an action.")
+    else:
+        changed = moderation.moderate(ids, approve=action == 'approve')
+        messages.success(request, f"{changed} article(s) {'approved' if action == 'approve' else 'rejected'}.")
+    next_url = request.POST.get('next', '')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect('moderation_queue')
 
 
 @login_required
+@require_POST
 def moderation_approve(request, pk):
     if not request.user.can_manage_articles():
         return redirect('feed_all')
-    article = get_object_or_404(Article, pk=pk)
-    article.is_published = True
-    article.save(update_fields=['is_published'])
-    messages.success(request, "Article published.")
+    if moderation.moderate([pk], approve=True):
+        messages.success(request, "Article published.")
     return redirect('moderation_queue')
 
 
@@ -267,5 +341,53 @@ def moderation_approve(request, pk):
 def article_confirm(request, pk):
     article = get_object_or_404(Article, pk=pk, author=request.user)
     article.is_published = False
-    article.save(update_fields=['is_published'])
+    article.is_rejected = False
+    article.save(update_fields=['is_published', 'is_rejected'])
     return JsonResponse({'status': 'waiting'})
+
+
+
+@staff_member_required
+def export_stream(request, name):
+    if name not in export.EXPORTS:
+        raise Http404
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(export.FORMATS)}"}, status=400)
+    try:
+        since = export.parse_since(request.GET['since']) if request.GET.get('since') else None
+    except ValueError:
+        return JsonResponse({'error': 'since must be an ISO 8601 datetime'}, status=400)
+    try:
+        since_id = int(request.GET['since_id']) if request.GET.get('since_id') else None
+    except ValueError:
+        return JsonResponse({'error': 'since_id must be an integer'}, status=400)
+
+    rows = export.export_rows(name, since, since_id)
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export.render(name, rows, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response
+
+
+@staff_member_required
+def sql_report(request):
+    if request.method == 'POST':
+        instrumentation.reset_report()
+        messages.success(request, "SQL report cleared.")
+        return redirect('sql_report')
+    return render(request, 'admin/sql_report.html', {
+        'title': "SQL per view",
+        'rows': instrumentation.get_report(),
+        'sample_rate': instrumentation.sample_rate(),
+        'threshold': instrumentation.duplicate_threshold(),
+    })
+
+
+def metrics_endpoint(request):
+    # скрейпер предъявляет METRICS_TOKEN; по адресу не пускаем — за прокси все запросы с 127.0.0.1
+    token = settings.METRICS_TOKEN
+    allowed = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (allowed or request.user.is_staff):
+        raise Http404
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,118 @@
+"""
+Primary/replica routing and SQLite connection tuning.
+
+Reads of the articles app go to the replica alias only inside safe (GET/HEAD)
+requests that PrimaryPinMiddleware has cleared: not after a write in the same
+request, and not within REPLICA_STICKY_SECONDS of the visitor's last write
+(read-your-writes, tracked with a short-lived cookie). Only writes to
+PIN_APPS models pin; session saves and other bookkeeping do not. Everything
+else — writes, sessions, auth, management commands, workers — uses the
+primary. Without a 'replica' alias in DATABASES the router is a no-op.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PIN_COOKIE = 'db_primary_until'
+REPLICA_READ_APPS = ('articles',)
+# записи, после которых посетитель должен читать свои же данные с primary
+PIN_APPS = ('articles', 'users')
+
+# True — чтения этого запроса можно отдавать реплике
+_replica_allowed = ContextVar('replica_allowed', default=False)
+_wrote = ContextVar('wrote', default=False)
+
+
+class PrimaryReplicaRouter:
+    def __init__(self, primary='default', replica='replica'):
+        self.primary = primary
+        self.replica = replica
+
+    def _has_replica(self):
+        return self.replica in connections.settings
+
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_allowed.get()
+            and model._meta.app_label in REPLICA_READ_APPS
+            and self._has_replica()
+        ):
+            return self.replica
+        return self.primary
+
+    def db_for_write(self, model, **hints):
+        # после записи остаток запроса читает с primary: реплика ещё не догнала;
+        # django_session и прочая служебная запись посетителя не закрепляют
+        if model._meta.app_label in PIN_APPS:
+            _wrote.set(True)
+            _replica_allowed.set(False)
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {self.primary, self.replica}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплика получает схему вместе с данными (sync_replica / внешняя репликация)
+        return db == self.primary
+
+
+def is_pinned(request):
+    """True while the visitor's read-your-writes cookie is active."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) >= time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def read_from_primary():
+    """Route the block's reads to the primary, e.g. when the result is shared through a cache."""
+    token = _replica_allowed.set(False)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+class PrimaryPinMiddleware:
+    """Decide per request whether reads may use the replica; set the sticky cookie after writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        allowed = request.method in ('GET', 'HEAD', 'OPTIONS') and not is_pinned(request)
+        allowed_token = _replica_allowed.set(allowed)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _replica_allowed.reset(allowed_token)
+            _wrote.reset(wrote_token)
+
+        if wrote:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(PIN_COOKIE, f'{time.time() + sticky:.0f}', max_age=sticky,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply settings.SQLITE_PRAGMAS to every new SQLite connection; READ_ONLY aliases get query_only."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+        if connection.settings_dict.get('READ_ONLY'):
+            cursor.execute('PRAGMA query_only = ON')
@@ -13,6 +13,7 @@ import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,7 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'articles.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'articles.instrumentation.SQLInstrumentationMiddleware',
+    'habr.db.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,12 +88,87 @@ WSGI_APPLICATION = 'habr.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Persistent connections with a health check; timeout is SQLite's busy timeout in seconds,
+# so writers wait for the lock instead of failing with "database is locked".
+# Set HABR_REPLICA_DB to a copy of the primary (see sync_replica) to serve article reads from it.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'timeout': 20},
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+if os.environ.get('HABR_REPLICA_DB'):
+    DATABASES['replica'] = dict(DATABASES['default'], NAME=os.environ['HABR_REPLICA_DB'], READ_ONLY=True)
+
+DATABASE_ROUTERS = ['habr.db.PrimaryReplicaRouter']
+
+# Reads stay on the primary this long after a visitor's write (read-your-writes).
+REPLICA_STICKY_SECONDS = 10
+
+# Applied to every new SQLite connection by habr.db.configure_sqlite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+
+# Cache
+# Local memory by default; set HABR_CACHE_DIR to share the cache between worker processes.
+# Both backends are the stock ones plus hit/miss counters for /metrics.
+
+if os.environ.get('HABR_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'articles.cache_backends.FileBasedMetricsCache',
+            'LOCATION': os.environ['HABR_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'articles.cache_backends.LocMemMetricsCache',
+            'LOCATION': 'habr',
+        }
+    }
+
+# With a shared cache the logged-in user (users/auth.py) and sessions are read from it; sessions
+# are written through to django_session, so they survive a cache flush. A per-process cache would
+# keep a logout or role change local to one worker, so then both come from the database.
+# ModelBackend stays listed: sessions created under it keep resolving.
+if os.environ.get('HABR_CACHE_DIR'):
+    AUTHENTICATION_BACKENDS = ['users.auth.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend']
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+
+# SQL instrumentation (articles.instrumentation): share of requests that get X-SQL-* headers
+# and go to the /admin/sql-report/ page; a fingerprint repeated this many times is an N+1 candidate.
+
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('HABR_SQL_SAMPLE_RATE', 1.0 if DEBUG else 0.01))
+SQL_INSTRUMENTATION_DUPLICATE_THRESHOLD = 3
+
+
+# Metrics (articles.metrics), served at /metrics to staff and to scrapers sending
+# "Authorization: Bearer $HABR_METRICS_TOKEN" (without a token only staff get in).
+# Set HABR_METRICS_DIR to aggregate across worker processes; clear it when the pool restarts.
+
+METRICS_DIR = os.environ.get('HABR_METRICS_DIR')
+METRICS_TOKEN = os.environ.get('HABR_METRICS_TOKEN', '')
+
+
+# Background jobs (articles.jobs) are executed by `manage.py run_worker`.
+# HABR_JOBS_EAGER=1 runs them right after the request's transaction commits instead.
+
+JOBS_EAGER = os.environ.get('HABR_JOBS_EAGER') == '1'
 
 
 # Password validation
@@ -138,3 +217,10 @@ CLOUDINARY_STORAGE = {
 }
 
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+
+# HABR_MEDIA_STORAGE=local keeps uploads and image variants under MEDIA_ROOT (works offline;
+# served by runserver when DEBUG is on).
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+if os.environ.get('HABR_MEDIA_STORAGE') == 'local':
+    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
@@ -1,11 +1,19 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from articles import views as article_views
 
 urlpatterns = [
+    path('admin/sql-report/', article_views.sql_report, name='sql_report'),
     path('admin/', admin.site.urls),
     path('', article_views.feed_all, name='home'),
     path('users/', include('users.urls')),
-    path('articles/', include('articles.urls'))
+    path('articles/', include('articles.urls')),
+    path('api/', include('articles.api_urls')),
+    path('metrics', article_views.metrics_endpoint, name='metrics'),
 
 ]
+
+# локальные загрузки (HABR_MEDIA_STORAGE=local); при DEBUG=False static() возвращает пустой список
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
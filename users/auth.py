@@ -0,0 +1,37 @@
+"""
+Cached user lookup for AuthenticationMiddleware.
+
+CachedModelBackend.get_user() serves the logged-in user (with role and the
+password hash the session check needs) from the cache, so an authenticated
+page view does not query users_user. Entries are dropped whenever a user is
+saved or deleted (users/signals.py) and by queryset update()/bulk_update()
+(UserQuerySet in users/models.py); USER_CACHE_TIMEOUT bounds only raw SQL.
+
+The backend is enabled only with a cache shared by all worker processes
+(see CACHES in settings): with per-process memory, a logout, role change
+or deactivation handled by one worker would not reach the others.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_users(user_ids):
+    cache.delete_many([user_cache_key(pk) for pk in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -1,7 +1,25 @@
+from django.contrib.auth import models as auth_models
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # auth.py тянет ModelBackend, а тот — get_user_model(): на уровне модуля был бы цикл
+        from .auth import invalidate_users
+
+        # update() (и bulk_update) не шлёт post_save — сбрасываем закэшированных пользователей сами
+        ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        invalidate_users(ids)
+        return updated
+
+
+class UserManager(auth_models.UserManager):
+    def get_queryset(self):
+        return UserQuerySet(self.model, using=self._db)
+
+
 class User(AbstractUser):
     class Roles(models.TextChoices):
         SUPERADMIN = 'superadmin', 'Super Admin'
@@ -14,6 +32,8 @@ class User(AbstractUser):
         default=Roles.USER
     )
 
+    objects = UserManager()
+
     def can_manage_articles(self):
         return self.role in [self.Roles.ADMIN, self.Roles.SUPERADMIN]
 
@@ -1,3 +1,76 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .models import User
+
+
+# включается в settings только при общем кэше (HABR_CACHE_DIR); здесь один процесс — locmem хватает
+@override_settings(
+    AUTHENTICATION_BACKENDS=['users.auth.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend'],
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class CachedAuthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer', password='pass12345')
+        cls.boss = User.objects.create_superuser('boss', password='pass12345', role=User.Roles.SUPERADMIN)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if 'FROM "django_session"' in q['sql'] or 'FROM "users_user"' in q['sql']
+        ]
+
+    def test_page_views_skip_session_and_user_queries(self):
+        url = reverse('feed_favorites')
+        self.auth_queries(url)
+        self.assertEqual(self.auth_queries(url), [])
+
+    def test_session_survives_cache_flush(self):
+        cache.clear()
+        self.assertNotEqual(self.auth_queries(reverse('feed_favorites')), [])
+        self.assertEqual(self.auth_queries(reverse('feed_favorites')), [])
+
+    def test_role_changes_invalidate_cached_user(self):
+        url = reverse('moderation_queue')
+        self.assertRedirects(self.client.get(url), reverse('feed_all'), fetch_redirect_response=False)
+
+        boss = Client()
+        boss.force_login(self.boss)
+        changelist = reverse('admin:users_user_changelist')
+        boss.post(changelist, {'action': 'promote_to_admin', '_selected_action': [self.user.pk]})
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        boss.post(changelist, {'action': 'demote_to_user', '_selected_action': [self.user.pk]})
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.role = User.Roles.ADMIN
+        user.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_queryset_updates_invalidate_cached_user(self):
+        url = reverse('sql_report')
+        self.client.get(url)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        User.objects.bulk_update([User(pk=self.user.pk, is_staff=False)], ['is_staff'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('feed_favorites')).status_code, 302)
+
+    def test_sessions_of_the_stock_backend_still_resolve(self):
+        client = Client()
+        client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(client.get(reverse('feed_favorites')).status_code, 200)